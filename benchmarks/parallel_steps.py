@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Throughput of SharedMemoryVecEnv (steps/sec over all environments) as a function of the number of worker processes
+
+    $ python -m benchmarks.parallel_steps --env Simple-MiniGrid-FourRooms-15x15-v0 --num_envs 4096 --render
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+import gym_simple_minigrid  # noqa: F401, registers the envs
+from gym_simple_minigrid.parallel import SharedMemoryVecEnv
+
+
+def steps_per_second(env_id, num_envs, num_workers, num_steps, render, tile_size):
+    envs = SharedMemoryVecEnv(env_id, num_envs, num_workers=num_workers, render=render, tile_size=tile_size)
+    try:
+        envs.reset()
+        actions = np.random.randint(3, size=(num_steps, num_envs))
+        start = time.perf_counter()
+        for t in range(num_steps):
+            envs.step(actions[t])
+        elapsed = time.perf_counter() - start
+    finally:
+        envs.close()
+    return num_steps * num_envs / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--env", help="gym environment to load", default='Simple-MiniGrid-FourRooms-15x15-v0')
+    parser.add_argument("--num_envs", type=int, help="total number of environments", default=4096)
+    parser.add_argument("--num_steps", type=int, help="number of batch steps to time", default=200)
+    parser.add_argument("--max_workers", type=int, help="largest number of workers", default=os.cpu_count())
+    parser.add_argument("--render", action='store_true', help="also render rgb_array frames after each step")
+    parser.add_argument("--tile_size", type=int, help="size at which to render tiles", default=8)
+    args = parser.parse_args()
+
+    workers = [1]
+    while workers[-1] * 2 <= args.max_workers:
+        workers.append(workers[-1] * 2)
+    if workers[-1] != args.max_workers:
+        workers.append(args.max_workers)
+
+    print(f'{args.env}, {args.num_envs} envs{", rendering" if args.render else ""}')
+    base = None
+    for num_workers in workers:
+        sps = steps_per_second(args.env, args.num_envs, num_workers, args.num_steps, args.render, args.tile_size)
+        base = base or sps
+        print(f'\t{num_workers:3} workers: {sps:14,.0f} steps/s ({sps / base:5.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
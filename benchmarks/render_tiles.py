@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Cold tile rendering benchmark: time to render every tile from scratch with the vectorized rasterizer, compared to the
+former per-pixel loop which evaluates the filter function once per pixel. Also times warming a full tile atlas and
+memory-mapping it back from disk, as worker processes do when a cache directory is configured
+
+    $ python -m benchmarks.render_tiles --tile_size 32
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import gym_simple_minigrid.rendering as rendering
+from gym_simple_minigrid.minigrid import Goal, Grid, TileAtlas, Wall
+
+
+def fill_coords_per_pixel(img, fn, color):
+    # Reference implementation of fill_coords before vectorization
+    for y in range(img.shape[0]):
+        for x in range(img.shape[1]):
+            yf = (y + 0.5) / img.shape[0]
+            xf = (x + 0.5) / img.shape[1]
+            if fn(xf, yf):
+                img[y, x] = color
+    return img
+
+
+def render_all_tiles(tile_size):
+    # Draw every object / agent direction combination from scratch
+    for obj in [None, Wall()] + [Goal(level) for level in range(6)]:
+        for agent_dir in [None, 0, 1, 2, 3]:
+            Grid.draw_tile(obj, agent_dir=agent_dir, tile_size=tile_size)
+
+
+def time_cold_render(tile_size, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render_all_tiles(tile_size)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_atlas(tile_size):
+    start = time.perf_counter()
+    atlas = TileAtlas(tile_size).warm()
+    warm = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'atlas.npy')
+        atlas.save(path)
+        start = time.perf_counter()
+        TileAtlas.load(path, tile_size).get_tile(0, 0, 0)
+        load = time.perf_counter() - start
+
+    return warm, load
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tile_size", type=int, help="size at which to render tiles", default=32)
+    parser.add_argument("--repeat", type=int, help="number of timed repetitions (best is kept)", default=3)
+    args = parser.parse_args()
+
+    vectorized = time_cold_render(args.tile_size, args.repeat)
+
+    # Temporarily swap in the per-pixel loop used by Grid.draw_tile and the objects
+    fill_coords = rendering.fill_coords
+    rendering.fill_coords = fill_coords_per_pixel
+    try:
+        per_pixel = time_cold_render(args.tile_size, 1)
+    finally:
+        rendering.fill_coords = fill_coords
+
+    print(f'Cold render of 40 tiles at tile_size={args.tile_size}')
+    print(f'\tper-pixel loop: {per_pixel * 1e3:10.2f} ms')
+    print(f'\tvectorized:     {vectorized * 1e3:10.2f} ms')
+    print(f'\tspeedup:        {per_pixel / vectorized:10.1f}x')
+
+    warm, load = time_atlas(args.tile_size)
+    print(f'Tile atlas of {TileAtlas.num_tiles} tiles at tile_size={args.tile_size}')
+    print(f'\twarm:           {warm * 1e3:10.2f} ms')
+    print(f'\tmmap load:      {load * 1e3:10.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Startup cost of short-lived processes: time to import gym and gym_simple_minigrid, to make an environment, to take
+the first step and to render the first frame, each measured in fresh interpreters (median over runs)
+
+    $ python -m benchmarks.startup --env Simple-MiniGrid-FourRooms-15x15-v0 --runs 10 --output startup.json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import numpy as np
+
+# Script run in every fresh interpreter, printing the cumulative time (in seconds) after each stage as JSON
+SCRIPT = """
+import json, time, warnings
+warnings.filterwarnings('ignore')
+start = time.perf_counter()
+times = {{}}
+import gym
+times['import_gym'] = time.perf_counter() - start
+import gym_simple_minigrid
+times['import_package'] = time.perf_counter() - start
+env = gym.make({env_id!r})
+times['make'] = time.perf_counter() - start
+env.reset()
+env.step(0)
+times['first_step'] = time.perf_counter() - start
+env.render('rgb_array', tile_size={tile_size})
+times['first_render'] = time.perf_counter() - start
+print(json.dumps(times))
+"""
+
+
+def measure(env_id, tile_size, runs):
+    script = SCRIPT.format(env_id=env_id, tile_size=tile_size)
+    runs = [json.loads(subprocess.run([sys.executable, '-c', script], check=True, capture_output=True,
+                                      text=True).stdout) for _ in range(runs)]
+    return {stage: float(np.median([run[stage] for run in runs])) for stage in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--env", help="gym environment to load", default='Simple-MiniGrid-FourRooms-15x15-v0')
+    parser.add_argument("--tile_size", type=int, help="size at which to render tiles", default=32)
+    parser.add_argument("--runs", type=int, help="number of fresh interpreters (median is kept)", default=10)
+    parser.add_argument("--output", help="JSON file to save the results to")
+    args = parser.parse_args()
+
+    times = measure(args.env, args.tile_size, args.runs)
+
+    print(f'{args.env}, median of {args.runs} fresh interpreters (cumulative)')
+    previous = 0
+    for stage, elapsed in times.items():
+        print(f'\t{stage:16} {elapsed * 1e3:10.1f} ms  (+{(elapsed - previous) * 1e3:.1f} ms)')
+        previous = elapsed
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'env': args.env, 'results': times}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
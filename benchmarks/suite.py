@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Throughput of every registered environment: steps/sec, resets/sec, rgb_array frames/sec at several tile sizes and
+vectorized steps/sec, plus cold (first draw) vs warm (tile atlas hit) Grid.render_tile and replay buffer sampling.
+Every metric is a rate (higher is better). Results can be saved as JSON and compared against a saved baseline, in
+which case the exit code is 1 if any metric regressed by more than the threshold
+
+    $ python -m benchmarks --output baseline.json
+    $ python -m benchmarks --baseline baseline.json --threshold 0.1
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import gym
+import numpy as np
+import gym_simple_minigrid  # noqa: F401, registers the envs
+from gym_simple_minigrid.cache import CACHE_DIR_ENV
+from gym_simple_minigrid.minigrid import Goal, Grid, TileAtlas, Wall
+from gym_simple_minigrid.register import env_list
+from gym_simple_minigrid.replay_buffer import HindsightReplayBuffer
+from gym_simple_minigrid.vector import SimpleMiniGridVecEnv
+
+
+def best_rate(fn, number, repeat):
+    # Calls per second of fn, keeping the best of repeat timings of number calls
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return number / best
+
+
+def bench_env(env_id, tile_sizes, number, repeat):
+    env = gym.make(env_id).unwrapped
+    env.reset()
+    actions = iter(np.random.randint(3, size=number * repeat * (2 + len(tile_sizes))))
+
+    def step():
+        _, _, done, _ = env.step(next(actions))
+        if done:
+            env.reset()
+
+    def step_render(tile_size):
+        # Frames are rendered after each step, as when recording episodes
+        step()
+        env.render('rgb_array', tile_size=tile_size)
+
+    results = {
+        'step': best_rate(step, number, repeat),
+        'reset': best_rate(env.reset, number, repeat),
+    }
+    for tile_size in tile_sizes:
+        env.render('rgb_array', tile_size=tile_size)
+        results[f'render_{tile_size}'] = best_rate(lambda: step_render(tile_size), number // 10, repeat)
+    env.close()
+
+    num_envs = 1024
+    envs = SimpleMiniGridVecEnv(env_id, num_envs)
+    batch_actions = np.random.randint(3, size=(number // 10, num_envs))
+    batches = iter(np.tile(batch_actions, (repeat, 1)))
+    results['vec_step'] = best_rate(lambda: envs.step(next(batches)), len(batch_actions), repeat) * num_envs
+
+    return {f'{env_id}/{name}': value for name, value in results.items()}
+
+
+def bench_render_tile(tile_sizes, repeat):
+    # Tiles per second of Grid.render_tile, drawing from scratch (cold) or reading the tile atlas (warm)
+    combos = [(obj, agent_dir) for obj in [None, Wall()] + [Goal(level) for level in range(6)]
+              for agent_dir in [None, 0, 1, 2, 3]]
+
+    def render_all(tile_size):
+        for obj, agent_dir in combos:
+            Grid.render_tile(obj, agent_dir=agent_dir, tile_size=tile_size)
+
+    # The disk cache would turn cold renders into memory-mapped loads
+    cache_directory = os.environ.pop(CACHE_DIR_ENV, None)
+    results = {}
+    try:
+        for tile_size in tile_sizes:
+            cold = float('inf')
+            for _ in range(repeat):
+                TileAtlas.cache.pop((tile_size, 3), None)
+                start = time.perf_counter()
+                render_all(tile_size)
+                cold = min(cold, time.perf_counter() - start)
+            results[f'render_tile_cold_{tile_size}'] = len(combos) / cold
+            results[f'render_tile_warm_{tile_size}'] = best_rate(lambda: render_all(tile_size), 100, repeat) * \
+                len(combos)
+    finally:
+        if cache_directory is not None:
+            os.environ[CACHE_DIR_ENV] = cache_directory
+    return results
+
+
+def bench_replay_buffer(batch_size, repeat):
+    # Batches per second sampled with hindsight relabeling from a full 1M-transition buffer
+    env = gym.make('Simple-MiniGrid-FourRooms-15x15-v0').unwrapped
+    states = np.zeros((1001, 3), dtype=int)
+    states[:, 0] = np.arange(1001) % env.width
+    buffer = HindsightReplayBuffer(10 ** 6, env.state_goal_mapper, seed=0)
+    for _ in range(1000):
+        buffer.add_episode(states, np.zeros(1000, dtype=int), (0, 0))
+    return {f'replay_buffer_sample_{batch_size}': best_rate(lambda: buffer.sample(batch_size), 1000, repeat)}
+
+
+def compare(results, baseline, threshold):
+    # Print the relative change of every metric and return the names of the ones that regressed
+    regressions = []
+    print(f'\n{"metric":60} {"baseline":>14} {"current":>14} {"change":>8}')
+    for name, value in results.items():
+        if name not in baseline:
+            continue
+        change = value / baseline[name] - 1
+        regressed = change < -threshold
+        if regressed:
+            regressions.append(name)
+        print(f'{name:60} {baseline[name]:14,.1f} {value:14,.1f} {change:+8.1%}{"  REGRESSION" if regressed else ""}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--envs", nargs='+', help="registered env ids to benchmark (all by default)", default=env_list)
+    parser.add_argument("--tile_sizes", nargs='+', type=int, help="tile sizes for rendering", default=[8, 16, 32])
+    parser.add_argument("--number", type=int, help="number of calls per timing", default=2000)
+    parser.add_argument("--repeat", type=int, help="number of timed repetitions (best is kept)", default=3)
+    parser.add_argument("--output", help="JSON file to save the results to")
+    parser.add_argument("--baseline", help="JSON file with baseline results to compare against")
+    parser.add_argument("--threshold", type=float, help="relative slowdown considered a regression", default=0.1)
+    args = parser.parse_args()
+
+    results = {}
+    for env_id in args.envs:
+        results.update(bench_env(env_id, args.tile_sizes, args.number, args.repeat))
+        print(f'{env_id}: {results[f"{env_id}/step"]:,.0f} steps/s, {results[f"{env_id}/reset"]:,.0f} resets/s')
+    results.update(bench_render_tile(args.tile_sizes, args.repeat))
+    results.update(bench_replay_buffer(256, args.repeat))
+
+    for name, value in results.items():
+        print(f'\t{name:60} {value:14,.1f}/s')
+
+    if args.output:
+        report = {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'gym': gym.__version__,
+            'machine': platform.machine(),
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'\n{len(regressions)} metrics regressed by more than {args.threshold:.0%}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
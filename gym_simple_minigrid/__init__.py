@@ -1,2 +1,19 @@
+import importlib
+
 # Import the envs module so that envs register themselves
+# Registration only records ids and entry points: environment code is imported by the first gym.make
 from . import envs
+
+# Instrumentation is enabled on import if $SIMPLE_MINIGRID_PROFILE is set
+from . import profiling
+
+
+def __getattr__(name):
+    # Other submodules (minigrid, vector, solver, ...) are imported on first access
+    try:
+        return importlib.import_module(f'{__name__}.{name}')
+    except ModuleNotFoundError as e:
+        # Only a missing submodule means a missing attribute: missing dependencies of a submodule are raised as is
+        if e.name != f'{__name__}.{name}':
+            raise
+        raise AttributeError(f'module {__name__} has no attribute {name}') from None
@@ -0,0 +1,118 @@
+import numpy as np
+from .minigrid import COLOR_TO_IDX, OBJECT_TO_IDX, TileAtlas
+
+
+def viewport_size(viewport, width, height):
+    """
+    (width, height) in cells of the frames rendered with a viewport (see SimpleMiniGridEnv.render) on a grid of a given
+    size (outer walls included), or of the whole grid if viewport is None
+    """
+
+    if viewport is None:
+        return width, height
+    if len(viewport) == 4:
+        x0, y0, x1, y1 = viewport
+        return min(x1, width) - max(x0, 0), min(y1, height) - max(y0, 0)
+    return min(viewport[0], width), min(viewport[1], height)
+
+
+def viewport_windows(viewport, agent_pos, width, height):
+    """
+    Origin (grid coordinates) of the viewport window of each environment, clipped to the grid as in
+    SimpleMiniGridEnv.viewport_window: crops centered on each agent, or an explicit window shared by all environments
+    :param agent_pos: (N, 2) agent positions in state coordinates
+    :return: x0 (N,), y0 (N,) arrays
+    """
+
+    n = len(agent_pos)
+    if viewport is None:
+        return np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+    if len(viewport) == 4:
+        return np.full(n, max(viewport[0], 0)), np.full(n, max(viewport[1], 0))
+    view_width, view_height = viewport_size(viewport, width, height)
+    x0 = np.clip(agent_pos[:, 0] + 1 - view_width // 2, 0, width - view_width)
+    y0 = np.clip(agent_pos[:, 1] + 1 - view_height // 2, 0, height - view_height)
+    return x0, y0
+
+
+class BatchRenderer:
+    """
+    Render frames of many environments at once into a single (N, H * tile_size, W * tile_size, 3) uint8 array
+    Frames are composed by gathering tiles from a warmed tile atlas with fancy indexing, without any per-cell or per-env
+    Python loop
+    """
+
+    def __init__(self, tile_size=32, subdivs=3):
+        self.tile_size = tile_size
+        self.atlas = TileAtlas.get(tile_size, subdivs).warm()
+
+        # Reusable buffer for gathered tiles, laid out as (N, rows, cols, tile_row, tile_col, rgb)
+        self.tiles = None
+
+    def render(self, layouts, agent_pos, agent_dir, goals=None, num_goals=None, out=None, viewport=None):
+        """
+        :param layouts: encoded grids (Grid.array, including outer walls) as an (N, W, H, 2) array, or a single
+            (W, H, 2) one shared by all environments
+        :param agent_pos: (N, 2) agent positions in state coordinates
+        :param agent_dir: (N,) agent directions
+        :param goals: optional (N, G, 2) goal stacks in state coordinates, bottom of the stack first
+        :param num_goals: optional (N,) number of goals in each stack (by default all G goals are drawn)
+        :param out: optional (N, H * tile_size, W * tile_size, 3) uint8 buffer to write the frames into
+        :param viewport: optional (width, height) in cells of crops centered on each agent, or an explicit
+            (x0, y0, x1, y1) window of grid cells shared by all environments (see SimpleMiniGridEnv.render). Only the
+            cells in the viewport are gathered, and frames are (N, height * tile_size, width * tile_size, 3)
+        :return: frames as an (N, H * tile_size, W * tile_size, 3) uint8 array
+        """
+
+        agent_pos = np.asarray(agent_pos)
+        n = len(agent_pos)
+        layouts = np.asarray(layouts)
+        env_idx = np.arange(n)
+
+        # Cells in the viewport window of each environment
+        grid_width, grid_height = layouts.shape[-3:-1]
+        x0, y0 = viewport_windows(viewport, agent_pos, grid_width, grid_height)
+        if viewport is None:
+            cells = np.broadcast_to(layouts, (n,) + layouts.shape[-3:])
+        else:
+            view_width, view_height = viewport_size(viewport, grid_width, grid_height)
+            xs = x0[:, None, None] + np.arange(view_width)[:, None]
+            ys = y0[:, None, None] + np.arange(view_height)
+            cells = layouts[xs, ys] if layouts.ndim == 3 else layouts[env_idx[:, None, None], xs, ys]
+        width, height = cells.shape[1:3]
+
+        # Atlas index of each cell without the agent
+        tile_idx = self.atlas.index(cells[..., 0], cells[..., 1])
+
+        # Overlay goal stacks, bottom first so that the top goal of stacked cells is the visible one
+        if goals is not None:
+            goals = np.asarray(goals) + 1
+            if num_goals is None:
+                num_goals = np.full(n, goals.shape[1])
+            for level in range(goals.shape[1]):
+                goal_tile = self.atlas.index(OBJECT_TO_IDX['goal'], COLOR_TO_IDX[f'grad_{min(level, 5)}'])
+                goal_x = goals[:, level, 0] - x0
+                goal_y = goals[:, level, 1] - y0
+                ids = env_idx[(level < num_goals) & (0 <= goal_x) & (goal_x < width) & (0 <= goal_y) &
+                              (goal_y < height)]
+                tile_idx[ids, goal_x[ids], goal_y[ids]] = goal_tile
+
+        # Draw the agent on its cell
+        agent_x = agent_pos[:, 0] + 1 - x0
+        agent_y = agent_pos[:, 1] + 1 - y0
+        ids = env_idx[(0 <= agent_x) & (agent_x < width) & (0 <= agent_y) & (agent_y < height)]
+        tile_idx[ids, agent_x[ids], agent_y[ids]] += np.asarray(agent_dir)[ids] + 1
+
+        # Gather tiles and lay them out as images
+        tiles_shape = (n, height, width, self.tile_size, self.tile_size, 3)
+        if self.tiles is None or self.tiles.shape != tiles_shape:
+            self.tiles = np.empty(tiles_shape, dtype=np.uint8)
+        np.take(self.atlas.tiles, tile_idx.transpose(0, 2, 1), axis=0, out=self.tiles)
+
+        frames_shape = (n, height * self.tile_size, width * self.tile_size, 3)
+        if out is None:
+            out = np.empty(frames_shape, dtype=np.uint8)
+        assert out.shape == frames_shape and out.dtype == np.uint8 and out.flags.c_contiguous
+        out.reshape(n, height, self.tile_size, width, self.tile_size, 3)[...] = self.tiles.transpose(0, 1, 3, 2, 4, 5)
+
+        return out
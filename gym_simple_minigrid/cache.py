@@ -0,0 +1,29 @@
+import os
+import numpy as np
+
+# Environment variable pointing to the directory used for on-disk caches (tile atlases, solver tables, ...)
+CACHE_DIR_ENV = 'SIMPLE_MINIGRID_CACHE_DIR'
+
+
+def cache_dir(default=None):
+    """
+    Directory for on-disk caches: $SIMPLE_MINIGRID_CACHE_DIR if set, otherwise default (None disables the cache)
+    """
+
+    path = os.environ.get(CACHE_DIR_ENV, default)
+    if path is not None:
+        path = os.path.expanduser(path)
+        os.makedirs(path, exist_ok=True)
+    return path
+
+
+def save_array(path, array):
+    """
+    Save an array to a .npy file atomically, so that concurrent processes never load a partially written file
+    """
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+    return
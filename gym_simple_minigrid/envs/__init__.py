@@ -1,2 +1,39 @@
-from ..envs.empty import *
-from ..envs.four_rooms import *
+import importlib
+from ..register import register
+
+# Module defining the environment classes with each name prefix
+# Modules are only imported when one of their classes is first accessed (e.g. by gym.make through its entry point),
+# so registering the environments does not import the environment code
+ENV_MODULES = {
+    'SimpleEmptyEnv': 'empty',
+    'SimpleFourRoomsEnv': 'four_rooms',
+    'SimplePoolEnv': 'pool',
+}
+
+# Size variations registered for each environment
+ENV_SIZES = {
+    'Empty': ('SimpleEmptyEnv', ['5x5', '10x10', '15x15', '20x20', '25x25', '100x100', '1000x1000']),
+    'FourRooms': ('SimpleFourRoomsEnv', ['5x5', '10x10', '15x15', '20x20', '25x25', '100x100', '1000x1000']),
+}
+
+# Environment classes exported by this package, e.g. by 'from gym_simple_minigrid.envs import *'
+__all__ = list(ENV_MODULES) + [f'{class_name}{size}' for class_name, sizes in ENV_SIZES.values() for size in sizes]
+
+
+def __getattr__(name):
+    for prefix, module in ENV_MODULES.items():
+        if name.startswith(prefix):
+            return getattr(importlib.import_module(f'{__name__}.{module}'), name)
+    raise AttributeError(f'module {__name__} has no attribute {name}')
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+for env_name, (class_name, sizes) in ENV_SIZES.items():
+    for size in sizes:
+        register(
+            _id=f'Simple-MiniGrid-{env_name}-{size}-v0',
+            entry_point=f'gym_simple_minigrid.envs:{class_name}{size}'
+        )
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 from ..minigrid import *
-from ..register import register
 
 
 class SimpleFourRoomsEnv(SimpleMiniGridEnv):
@@ -10,25 +9,13 @@ class SimpleFourRoomsEnv(SimpleMiniGridEnv):
 
         self.max_steps = 8 * grid_size
 
-    def reset(self):
-        # Step count since episode start
-        self.step_count = 0
-
+    def create_layout(self):
         # Create grid
         self.create_grid(self.width, self.height)
         self.create_outer_wall()
         self.create_room_walls()
         self.create_room_doors()
 
-        # Select a random initial state and goal
-        self.reset_state_goal()
-
-        # Add goal
-        self.goals = list()
-        self.add_goal(self.goal_pos)
-
-        return self.state, self.goal_pos
-
     def create_room_walls(self):
         x = self.grid.width // 2
         y = self.grid.height // 2
@@ -74,27 +61,11 @@ class SimpleFourRoomsEnv25x25(SimpleFourRoomsEnv):
         super().__init__(grid_size=25)
 
 
-register(
-    _id='Simple-MiniGrid-FourRooms-5x5-v0',
-    entry_point='gym_simple_minigrid.envs:SimpleFourRoomsEnv5x5'
-)
-
-register(
-    _id='Simple-MiniGrid-FourRooms-10x10-v0',
-    entry_point='gym_simple_minigrid.envs:SimpleFourRoomsEnv10x10'
-)
-
-register(
-    _id='Simple-MiniGrid-FourRooms-15x15-v0',
-    entry_point='gym_simple_minigrid.envs:SimpleFourRoomsEnv15x15'
-)
+class SimpleFourRoomsEnv100x100(SimpleFourRoomsEnv):
+    def __init__(self):
+        super().__init__(grid_size=100)
 
-register(
-    _id='Simple-MiniGrid-FourRooms-20x20-v0',
-    entry_point='gym_simple_minigrid.envs:SimpleFourRoomsEnv20x20'
-)
 
-register(
-    _id='Simple-MiniGrid-FourRooms-25x25-v0',
-    entry_point='gym_simple_minigrid.envs:SimpleFourRoomsEnv25x25'
-)
+class SimpleFourRoomsEnv1000x1000(SimpleFourRoomsEnv):
+    def __init__(self):
+        super().__init__(grid_size=1000)
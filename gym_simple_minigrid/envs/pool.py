@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from ..generators import LayoutPool
+from ..minigrid import *
+
+
+class SimplePoolEnv(SimpleMiniGridEnv):
+    """
+    Environment drawing the layout of each episode from a pool of pregenerated layouts (see generators.LayoutPool)
+    """
+
+    def __init__(self, pool, max_steps=None, seed=9):
+        """
+        :param pool: LayoutPool, or path of a saved one (memory-mapped)
+        """
+
+        if isinstance(pool, str):
+            pool = LayoutPool.load(pool)
+        self.pool = pool
+
+        # Index of the layout of the current episode in the pool
+        self.layout_index = None
+        super().__init__(width=pool.width, height=pool.height, max_steps=max_steps, seed=seed)
+
+    def reset(self, layout_index=None):
+        # Draw a random layout from the pool, unless a specific one is requested
+        if layout_index is None:
+            layout_index = self.np_random.randint(len(self.pool))
+        self.layout_index = int(layout_index)
+        return super().reset()
+
+    def get_layout(self):
+        return self.pool.layout(self.layout_index)
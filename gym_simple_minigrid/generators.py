@@ -0,0 +1,190 @@
+from collections import OrderedDict
+import numpy as np
+from gym.utils import seeding
+from .cache import save_array
+from .minigrid import EMPTY_ENCODING, Grid, Layout, Wall
+
+
+def reachable(walls, start):
+    """
+    Cells reachable from start, by flood fill (repeated dilation) of the free cells
+    :param walls: (width, height) boolean wall mask
+    :param start: (x, y) free cell to start from
+    :return: (width, height) boolean mask
+    """
+
+    free = ~walls
+    reached = np.zeros_like(free)
+    reached[tuple(start)] = True
+    while True:
+        grown = reached.copy()
+        grown[1:] |= reached[:-1]
+        grown[:-1] |= reached[1:]
+        grown[:, 1:] |= reached[:, :-1]
+        grown[:, :-1] |= reached[:, 1:]
+        grown &= free
+        if (grown == reached).all():
+            return reached
+        reached = grown
+
+
+def is_connected(walls):
+    # Whether every free cell can be reached from every other one (and there are at least two of them)
+    free = np.argwhere(~walls)
+    return len(free) > 1 and reachable(walls, free[0]).sum() == len(free)
+
+
+def maze(np_random, width, height):
+    """
+    Perfect maze (a single path between any two cells) carved with a randomized depth-first search
+    Corridors run along even coordinates, so odd sizes give mazes without a thick border
+    """
+
+    walls = np.ones((width, height), dtype=bool)
+    cols, rows = (width + 1) // 2, (height + 1) // 2
+    visited = np.zeros((cols, rows), dtype=bool)
+
+    stack = [(np_random.randint(cols), np_random.randint(rows))]
+    visited[stack[0]] = True
+    walls[2 * stack[0][0], 2 * stack[0][1]] = False
+    while stack:
+        x, y = stack[-1]
+        neighbors = [(x + dx, y + dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                     if 0 <= x + dx < cols and 0 <= y + dy < rows and not visited[x + dx, y + dy]]
+        if not neighbors:
+            stack.pop()
+            continue
+        nx, ny = neighbors[np_random.randint(len(neighbors))]
+        visited[nx, ny] = True
+        walls[2 * nx, 2 * ny] = False
+        walls[x + nx, y + ny] = False
+        stack.append((nx, ny))
+    return walls
+
+
+def rooms(np_random, width, height, num_rooms=4):
+    """
+    Rooms obtained by recursive division: the largest room is split in two by a wall with a door, until num_rooms
+    rooms exist or no room can be split. Walls never block existing doors, so all rooms are connected
+    """
+
+    walls = np.zeros((width, height), dtype=bool)
+    # Rooms as [x0, x1) x [y0, y1) state coordinates
+    splittable = [(0, width, 0, height)]
+    num_split = 1
+    while num_split < num_rooms and splittable:
+        splittable.sort(key=lambda room: (room[1] - room[0]) * (room[3] - room[2]))
+        x0, x1, y0, y1 = splittable.pop()
+
+        # Candidate walls leave at least one free line on each side, and do not end in front of a door
+        candidates = [('x', p) for p in range(x0 + 1, x1 - 1)
+                      if not (y0 > 0 and not walls[p, y0 - 1]) and not (y1 < height and not walls[p, y1])]
+        candidates += [('y', p) for p in range(y0 + 1, y1 - 1)
+                       if not (x0 > 0 and not walls[x0 - 1, p]) and not (x1 < width and not walls[x1, p])]
+        if not candidates:
+            continue
+
+        axis, p = candidates[np_random.randint(len(candidates))]
+        if axis == 'x':
+            walls[p, y0:y1] = True
+            walls[p, np_random.randint(y0, y1)] = False
+            splittable += [(x0, p, y0, y1), (p + 1, x1, y0, y1)]
+        else:
+            walls[x0:x1, p] = True
+            walls[np_random.randint(x0, x1), p] = False
+            splittable += [(x0, x1, y0, p), (x0, x1, p + 1, y1)]
+        num_split += 1
+    return walls
+
+
+def obstacles(np_random, width, height, density=0.2, min_free=0.5):
+    """
+    Randomly placed single-cell obstacles. Cells cut off from the main area are filled with walls, and layouts whose
+    main area is smaller than min_free (fraction of all cells) are drawn again
+    """
+
+    while True:
+        walls = np_random.random((width, height)) < density
+        free = np.argwhere(~walls)
+        if len(free) < 2:
+            continue
+        walls |= ~reachable(walls, free[np_random.randint(len(free))])
+        if (~walls).sum() >= min_free * width * height:
+            return walls
+
+
+GENERATORS = {
+    'maze': maze,
+    'rooms': rooms,
+    'obstacles': obstacles,
+}
+
+
+class LayoutPool:
+    """
+    Pool of pregenerated layouts of the same size, stored as a single (N, width + 2, height + 2) uint8 wall mask array
+    (outer walls included, indexed as [layout, x, y]). Pools are saved as .npy files and memory-mapped when loaded, so
+    that every worker process reads the same pages instead of holding its own copy
+    Layout objects (with their transition tables) are built on demand and kept in a small LRU cache
+    """
+
+    def __init__(self, walls, cache_size=256):
+        self.walls = walls
+        self.cache_size = cache_size
+        self.layouts = OrderedDict()
+
+    @classmethod
+    def generate(cls, kind, num_layouts, width, height, seed=None, **kwargs):
+        """
+        :param kind: generator name, one of GENERATORS
+        :param num_layouts: number of layouts N
+        :param width: width of the layouts (without outer walls)
+        :param height: height of the layouts (without outer walls)
+        :param seed: seed of the generator
+        :param kwargs: extra arguments of the generator (e.g. num_rooms, density)
+        """
+
+        np_random, _ = seeding.np_random(seed)
+        generator = GENERATORS[kind]
+        walls = np.ones((num_layouts, width + 2, height + 2), dtype=np.uint8)
+        for i in range(num_layouts):
+            layout = generator(np_random, width, height, **kwargs)
+            assert is_connected(layout), f'Generated {kind} layout is not connected'
+            walls[i, 1:-1, 1:-1] = layout
+        return cls(walls)
+
+    @classmethod
+    def load(cls, path, cache_size=256):
+        return cls(np.load(path, mmap_mode='r'), cache_size)
+
+    def save(self, path):
+        save_array(path, np.asarray(self.walls))
+        return
+
+    def __len__(self):
+        return len(self.walls)
+
+    @property
+    def width(self):
+        return self.walls.shape[1] - 2
+
+    @property
+    def height(self):
+        return self.walls.shape[2] - 2
+
+    def layout(self, i):
+        # Layout number i, built from the pool on first use
+        if i in self.layouts:
+            self.layouts.move_to_end(i)
+            return self.layouts[i]
+
+        grid = Grid(self.width + 2, self.height + 2)
+        walls = self.walls[i].astype(bool)
+        grid.array[walls] = Wall().encode()
+        grid.array[~walls] = EMPTY_ENCODING
+        layout = Layout(grid)
+
+        self.layouts[i] = layout
+        if len(self.layouts) > self.cache_size:
+            self.layouts.popitem(last=False)
+        return layout
@@ -1,8 +1,13 @@
 import gym
+import math
+import numpy as np
 from enum import IntEnum
 from gym import spaces
 from gym.utils import seeding
-from .rendering import *
+import os
+from . import profiling
+from .cache import cache_dir, save_array
+from .oracle import goal_distances
 
 # Map of color names to RGB values
 COLORS = {
@@ -28,12 +33,34 @@ COLORS = {
 
 # Used to map colors to integers
 COLOR_TO_IDX = {k: i for i, k in enumerate(COLORS)}
+IDX_TO_COLOR = {i: k for k, i in COLOR_TO_IDX.items()}
 
 # Map of object type to integers
+# 'empty' is only used to encode grid cells without any object
 OBJECT_TO_IDX = {
     'wall': 0,
     'goal': 1,
+    'empty': 2,
 }
+IDX_TO_OBJECT = {i: k for k, i in OBJECT_TO_IDX.items()}
+
+# Encoding of a grid cell without any object
+EMPTY_ENCODING = (OBJECT_TO_IDX['empty'], 0)
+
+# Color index of goals of each level (levels above 5 share the last color)
+GOAL_COLOR_IDX = np.array([COLOR_TO_IDX[f'grad_{level}'] for level in range(6)], dtype=np.uint8)
+
+# Width of the grid lines drawn around each tile, relative to the tile size
+GRID_LINE_THICKNESS = 0.031
+
+# Layouts with more cells than this use the large-grid mode: no wall mask copy and no transition table
+LARGE_GRID_CELLS = 128 * 128
+
+# Viewport (width, height in cells) rendered around the agent by default on large grids
+LARGE_GRID_VIEWPORT = (25, 25)
+
+# Layouts with more cells than this do not build distance tensors (goals x states int16, ~50 MB at 50x50)
+MAX_DISTANCE_CELLS = 50 * 50
 
 # Map of agent direction indices to vectors
 DIRS = [
@@ -47,6 +74,8 @@ DIRS = [
     (0, -1),
 ]
 DIR_TO_VEC = {i: np.array(d) for i, d in enumerate(DIRS)}
+# Same mapping as an array, to be indexed with arrays of directions
+DIR_VEC = np.array(DIRS)
 # VEC_TO_DIR = {d: i for i, d in enumerate(DIRS)}
 
 
@@ -69,6 +98,23 @@ class WorldObj:
         """Encode the a description of this object as a 2-tuple of integers"""
         return OBJECT_TO_IDX[self.type], COLOR_TO_IDX[self.color]
 
+    @staticmethod
+    def decode(type_idx, color_idx):
+        """Create an object from its 2-tuple of integers encoding (None for empty cells)"""
+        obj_type = IDX_TO_OBJECT[type_idx]
+        color = IDX_TO_COLOR[color_idx]
+
+        if obj_type == 'empty':
+            return None
+        if obj_type == 'wall':
+            return Wall(color)
+        if obj_type == 'goal':
+            # Goal color encodes its level (clipped for visualization purposes)
+            obj = Goal()
+            obj.color = color
+            return obj
+        raise ValueError(f'Unknown object type {obj_type}')
+
 
 class Goal(WorldObj):
     def __init__(self, level=0):
@@ -76,7 +122,8 @@ class Goal(WorldObj):
         super().__init__('goal', color)
 
     def render(self, img):
-        fill_coords(img, point_in_rect(0.1, 0.9, 0.1, 0.9), COLORS[self.color])
+        from . import rendering
+        rendering.fill_coords(img, rendering.point_in_rect(0.1, 0.9, 0.1, 0.9), COLORS[self.color])
 
 
 class Wall(WorldObj):
@@ -85,17 +132,16 @@ class Wall(WorldObj):
         super().__init__('wall', color)
 
     def render(self, img):
-        fill_coords(img, point_in_rect(0, 1, 0, 1), COLORS[self.color])
+        from . import rendering
+        rendering.fill_coords(img, rendering.point_in_rect(0, 1, 0, 1), COLORS[self.color])
 
 
 class Grid:
     """
     Represent a grid and operations on it
+    Cells are stored encoded in a contiguous uint8 array indexed as [x, y], whose last axis holds (type, color)
     """
 
-    # Static cache of pre-renderer tiles
-    tile_cache = {}
-
     def __init__(self, width, height):
         assert width >= 3
         assert height >= 3
@@ -103,34 +149,54 @@ class Grid:
         self.width = width
         self.height = height
 
-        self.grid = [None] * width * height
+        self.array = np.zeros((width, height, 2), dtype=np.uint8)
+        self.array[..., 0] = OBJECT_TO_IDX['empty']
+
+    @property
+    def walls(self):
+        # Boolean wall mask indexed as [x, y]
+        return self.array[..., 0] == OBJECT_TO_IDX['wall']
 
     def set(self, i, j, v):
         # Sets object v into (i, j) position
         # Returns previous object in this position if any (e.g. stacked subgoals)
         assert 0 <= i < self.width
         assert 0 <= j < self.height
-        old_obj = self.grid[j * self.width + i]
-        self.grid[j * self.width + i] = v
+        old_obj = WorldObj.decode(*self.array[i, j])
+        self.array[i, j] = v.encode() if v is not None else EMPTY_ENCODING
         return old_obj
 
     def get(self, i, j):
         # Gets object in (i, j) position
         assert 0 <= i < self.width
         assert 0 <= j < self.height
-        return self.grid[j * self.width + i]
+        return WorldObj.decode(*self.array[i, j])
+
+    def get_encoding(self, i, j):
+        # (type, color) encoding of the cell in (i, j) position
+        return self.array[i, j]
+
+    def set_encoding(self, i, j, encoding):
+        self.array[i, j] = encoding
+
+    def cells(self, window=None):
+        # Encoded cells of an (x0, y0, x1, y1) window, or of the whole grid
+        x0, y0, x1, y1 = (0, 0, self.width, self.height) if window is None else window
+        return self.array[x0:x1, y0:y1]
 
     def horz_wall(self, x, y, length=None, obj_type=Wall):
         if length is None:
             length = self.width - x
-        for i in range(0, length):
-            self.set(x + i, y, obj_type())
+        assert 0 <= x and x + length <= self.width
+        assert 0 <= y < self.height
+        self.array[x:x + length, y] = obj_type().encode()
 
     def vert_wall(self, x, y, length=None, obj_type=Wall):
         if length is None:
             length = self.height - y
-        for j in range(0, length):
-            self.set(x, y + j, obj_type())
+        assert 0 <= x < self.width
+        assert 0 <= y and y + length <= self.height
+        self.array[x, y:y + length] = obj_type().encode()
 
     def wall_rect(self, x=0, y=0, w=None, h=None):
         if w is None:
@@ -144,18 +210,27 @@ class Grid:
         self.vert_wall(x + w - 1, y, h)
 
     @classmethod
-    def render_tile(cls, obj, agent_dir=None, tile_size=32, subdivs=3, thick=0.031):
+    def render_tile(cls, obj, agent_dir=None, tile_size=32, subdivs=3, thick=GRID_LINE_THICKNESS):
         """
-        Render a tile and cache the result
+        Render a tile, reading it from the tile atlas of its size
         """
 
-        # Hash map lookup key for the cache
+        if thick != GRID_LINE_THICKNESS:
+            # Atlases only hold tiles with the default grid lines
+            return cls.draw_tile(obj, agent_dir, tile_size, subdivs, thick)
+
         # Object encoding identifies shape and color
-        key = (agent_dir,)
-        key = obj.encode() + key if obj else key
+        type_idx, color_idx = obj.encode() if obj else EMPTY_ENCODING
+        return TileAtlas.get(tile_size, subdivs).get_tile(type_idx, color_idx, agent_dir)
 
-        if key in cls.tile_cache:
-            return cls.tile_cache[key]
+    @staticmethod
+    def draw_tile(obj, agent_dir=None, tile_size=32, subdivs=3, thick=GRID_LINE_THICKNESS):
+        """
+        Draw a tile from scratch
+        """
+
+        # Drawing primitives are only imported when tiles are drawn (not when atlases are loaded from disk)
+        from .rendering import downsample, fill_coords, point_in_rect, point_in_triangle, rotate_fn
 
         img = np.zeros(shape=(tile_size * subdivs, tile_size * subdivs, 3), dtype=np.uint8)
 
@@ -183,41 +258,347 @@ class Grid:
         # Downsample the image to perform supersampling/anti-aliasing
         img = downsample(img, subdivs)
 
-        # Cache the rendered tile
-        cls.tile_cache[key] = img
-
-        return img
+        return img.astype(np.uint8)
 
-    def render(self, tile_size, agent_pos=None, agent_dir=None):
+    def render(self, tile_size, agent_pos=None, agent_dir=None, window=None):
         """
         Render this grid at a given scale
         :param tile_size: tile size in pixels
         :param agent_pos:
         :param agent_dir:
+        :param window: optional (x0, y0, x1, y1) window of cells to render, only its tiles are drawn
         """
 
-        # Compute the total grid size
-        width_px = self.width * tile_size
-        height_px = self.height * tile_size
+        atlas = TileAtlas.get(tile_size)
 
-        img = np.zeros(shape=(height_px, width_px, 3), dtype=np.uint8)
+        x0, y0, x1, y1 = (0, 0, self.width, self.height) if window is None else window
+        array = self.cells(window)
+        width, height = array.shape[:2]
 
-        # Render the grid
-        for j in range(0, self.height):
-            for i in range(0, self.width):
-                cell_obj = self.get(i, j)
+        # Atlas index of the tile of each cell, with the agent (if any) drawn on its cell
+        agent_dirs = np.full((width, height), -1)
+        if agent_pos is not None and x0 <= agent_pos[0] < x1 and y0 <= agent_pos[1] < y1:
+            agent_dirs[agent_pos[0] - x0, agent_pos[1] - y0] = agent_dir
+        tile_idx = atlas.index(array[..., 0], array[..., 1], agent_dirs)
+        atlas.draw_missing(tile_idx)
 
-                agent_here = np.array_equal(agent_pos, (i, j))
-                tile_img = Grid.render_tile(cell_obj, agent_dir=agent_dir if agent_here else None, tile_size=tile_size)
+        # Gather tiles as (row, col, tile_row, tile_col, rgb) and lay them out as an image
+        tiles = atlas.tiles[tile_idx.T]
+        img = tiles.transpose(0, 2, 1, 3, 4).reshape(height * tile_size, width * tile_size, 3)
 
-                ymin = j * tile_size
-                ymax = (j + 1) * tile_size
-                xmin = i * tile_size
-                xmax = (i + 1) * tile_size
-                img[ymin:ymax, xmin:xmax, :] = tile_img
+        return img
 
+    def render_cell(self, img, tile_size, i, j, agent_dir=None):
+        """
+        Repaint the tile of cell (i, j) in an image rendered by self.render
+        """
+
+        tile = Grid.render_tile(self.get(i, j), agent_dir=agent_dir, tile_size=tile_size)
+        img[j * tile_size:(j + 1) * tile_size, i * tile_size:(i + 1) * tile_size, :] = tile
         return img
 
+    def copy(self):
+        """
+        Copy of this grid, with its own (writable) cell array
+        """
+
+        grid = Grid.__new__(Grid)
+        grid.width = self.width
+        grid.height = self.height
+        grid.array = self.array.copy()
+        return grid
+
+
+class OverlayGrid(Grid):
+    """
+    Grid sharing the (read-only) cell array of another grid, with a sparse overlay of the cells that differ from it
+    Used by environments on large layouts instead of a private copy of the layout grid, so that their memory grows with
+    their number of goals and not with the grid size
+    """
+
+    def __init__(self, grid):
+        self.width = grid.width
+        self.height = grid.height
+        self.array = grid.array
+        self.overlay = {}
+
+    def get(self, i, j):
+        return WorldObj.decode(*self.get_encoding(i, j))
+
+    def set(self, i, j, v):
+        old_obj = self.get(i, j)
+        self.set_encoding(i, j, v.encode() if v is not None else EMPTY_ENCODING)
+        return old_obj
+
+    def get_encoding(self, i, j):
+        encoding = self.overlay.get((i, j))
+        return self.array[i, j] if encoding is None else encoding
+
+    def set_encoding(self, i, j, encoding):
+        # Cells restored to their shared contents leave the overlay
+        if (self.array[i, j] == encoding).all():
+            self.overlay.pop((i, j), None)
+        else:
+            self.overlay[i, j] = np.array(encoding, dtype=np.uint8)
+
+    def cells(self, window=None):
+        x0, y0, x1, y1 = (0, 0, self.width, self.height) if window is None else window
+        array = self.array[x0:x1, y0:y1].copy()
+        for (i, j), encoding in self.overlay.items():
+            if x0 <= i < x1 and y0 <= j < y1:
+                array[i - x0, j - y0] = encoding
+        return array
+
+    def copy(self):
+        grid = OverlayGrid(self)
+        grid.overlay = dict(self.overlay)
+        return grid
+
+
+class SparseGoalLevels(dict):
+    """
+    Goal levels of large layouts as a {(x, y): level} dict of the cells with goals, indexed like the (width, height)
+    goal_levels array of other layouts: cells without goals have level -1
+    """
+
+    def __missing__(self, key):
+        return -1
+
+    def __setitem__(self, key, level):
+        if level < 0:
+            self.pop(key, None)
+        else:
+            super().__setitem__(key, level)
+
+
+class TileAtlas:
+    """
+    Rendered tiles for every (object type, color, agent direction) combination at a given tile size and subdivisions
+    Tiles are stored in a single contiguous (K, tile_size, tile_size, 3) uint8 array and drawn on first use, or all at
+    once with warm(). If a cache directory is configured (see cache.py), fully drawn atlases are saved to disk and
+    memory-mapped, so that other processes can start without drawing any tile
+    """
+
+    # Static cache of atlases, keyed by (tile_size, subdivs)
+    cache = {}
+
+    # Agent slots per cell: no agent, or agent facing each of the 4 directions
+    num_agent_slots = 5
+    num_tiles = len(OBJECT_TO_IDX) * len(COLORS) * num_agent_slots
+
+    def __init__(self, tile_size, subdivs=3, tiles=None):
+        self.tile_size = tile_size
+        self.subdivs = subdivs
+
+        if tiles is None:
+            self.tiles = np.zeros((self.num_tiles, tile_size, tile_size, 3), dtype=np.uint8)
+            self.drawn = np.zeros(self.num_tiles, dtype=bool)
+        else:
+            assert tiles.shape == (self.num_tiles, tile_size, tile_size, 3)
+            self.tiles = tiles
+            self.drawn = np.ones(self.num_tiles, dtype=bool)
+
+    @classmethod
+    def get(cls, tile_size, subdivs=3):
+        """
+        Get the atlas for a tile size and subdivisions, loading it from the disk cache if possible
+        """
+
+        key = (tile_size, subdivs)
+        if key not in cls.cache:
+            directory = cache_dir()
+            if directory is None:
+                atlas = cls(tile_size, subdivs)
+            else:
+                path = os.path.join(directory, f'tile_atlas_{tile_size}x{subdivs}_{cls.num_tiles}.npy')
+                try:
+                    atlas = cls.load(path, tile_size, subdivs)
+                except (OSError, ValueError, AssertionError):
+                    # Missing or stale file: draw every tile and persist them
+                    cls(tile_size, subdivs).save(path)
+                    atlas = cls.load(path, tile_size, subdivs)
+            cls.cache[key] = atlas
+        return cls.cache[key]
+
+    @classmethod
+    def load(cls, path, tile_size, subdivs=3):
+        # Memory-map a saved atlas (read-only)
+        return cls(tile_size, subdivs, tiles=np.load(path, mmap_mode='r'))
+
+    def save(self, path):
+        # Draw all missing tiles and save the atlas
+        self.warm()
+        save_array(path, self.tiles)
+        return
+
+    @classmethod
+    def index(cls, type_idx, color_idx, agent_dir=None):
+        """
+        Index of a tile in the atlas
+        Also works elementwise on arrays, where an agent_dir of -1 means no agent
+        """
+
+        agent_slot = 0 if agent_dir is None else np.asarray(agent_dir, dtype=np.intp) + 1
+        return (np.asarray(type_idx, dtype=np.intp) * len(COLORS) + color_idx) * cls.num_agent_slots + agent_slot
+
+    def get_tile(self, type_idx, color_idx, agent_dir=None):
+        k = self.index(type_idx, color_idx, agent_dir)
+        if not self.drawn[k]:
+            self.draw(k)
+        return self.tiles[k]
+
+    def draw(self, k):
+        # Draw tile k into the atlas
+        cell, agent_slot = divmod(int(k), self.num_agent_slots)
+        obj = WorldObj.decode(*divmod(cell, len(COLORS)))
+        agent_dir = agent_slot - 1 if agent_slot else None
+        self.tiles[k] = Grid.draw_tile(obj, agent_dir, self.tile_size, self.subdivs)
+        self.drawn[k] = True
+        return
+
+    def draw_missing(self, indices):
+        # Make sure that every tile in an array of indices is drawn
+        for k in np.unique(indices[~self.drawn[indices]]):
+            self.draw(k)
+        return
+
+    def warm(self):
+        # Draw every tile not drawn yet
+        self.draw_missing(np.arange(self.num_tiles))
+        return self
+
+
+class Layout:
+    """
+    Static layout (walls, doors, ...) of an environment
+    Built once per environment class and size, and shared by every instance. It must not be modified: environments
+    draw their goals on a private copy of the layout grid (a sparse overlay of it for large layouts)
+    Large layouts (more than LARGE_GRID_CELLS cells) read walls from the layout grid itself and compute transitions on
+    the fly instead of building a wall mask and a transition table, so that no per-cell structure is added to the grid
+    """
+
+    def __init__(self, grid, large=None):
+        self.grid = grid
+        self.grid.array.flags.writeable = False
+        self.large = grid.width * grid.height > LARGE_GRID_CELLS if large is None else large
+
+        # Boolean wall mask indexed as [x, y] in grid coordinates, None in large mode where walls are read from the
+        # grid cell types (see is_wall)
+        self.walls = None if self.large else grid.walls
+        if self.walls is not None:
+            self.walls.flags.writeable = False
+
+        # Walkable cells in state coordinates, used to sample initial states and goals by direct indexing
+        free_cells = np.argwhere(grid.array[1:-1, 1:-1, 0] == OBJECT_TO_IDX['empty'])
+        self.free_cells = free_cells.astype(np.int32) if self.large else free_cells
+        self.free_cells.flags.writeable = False
+
+        # Lazily built cell index, transition table, goal distances and padded cell types
+        self._cell_index = None
+        self._padded_types = {}
+        self._next_state = None
+        self._goal_distances = None
+
+    @property
+    def cell_index(self):
+        # Index of each cell (state coordinates) in self.free_cells, -1 for non-free cells
+        if self._cell_index is None:
+            cell_index = np.full((self.grid.width - 2, self.grid.height - 2), -1)
+            cell_index[self.free_cells[:, 0], self.free_cells[:, 1]] = np.arange(len(self.free_cells))
+            cell_index.flags.writeable = False
+            self._cell_index = cell_index
+        return self._cell_index
+
+    def padded_types(self, pad):
+        # Cell types (grid coordinates) padded with pad walls on every side, e.g. to gather egocentric views
+        if pad not in self._padded_types:
+            padded = np.pad(self.grid.array[..., 0], pad, constant_values=OBJECT_TO_IDX['wall'])
+            padded.flags.writeable = False
+            self._padded_types[pad] = padded
+        return self._padded_types[pad]
+
+    def is_wall(self, x, y):
+        # Whether cells (x, y) in grid coordinates are walls, elementwise
+        if self.walls is not None:
+            return self.walls[x, y]
+        return self.grid.array[x, y, 0] == OBJECT_TO_IDX['wall']
+
+    def transition(self, x, y, agent_dir, action):
+        """
+        Next (x, y, dir) state computed from the walls instead of the transition table, elementwise
+        """
+
+        actions = SimpleMiniGridEnv.Actions
+        next_dir = np.where(action == actions.left, (agent_dir - 1) % 4,
+                            np.where(action == actions.right, (agent_dir + 1) % 4, agent_dir))
+        fwd_x = x + DIR_VEC[agent_dir, 0]
+        fwd_y = y + DIR_VEC[agent_dir, 1]
+        move = (action == actions.forward) & ~self.is_wall(fwd_x + 1, fwd_y + 1)
+        return np.stack((np.where(move, fwd_x, x), np.where(move, fwd_y, y), next_dir), axis=-1)
+
+    @property
+    def next_state(self):
+        """
+        Transition table indexed as [x, y, dir, action] (state coordinates) holding the resulting (x, y, dir)
+        Built on first access and shared by every environment using this layout
+        """
+
+        if self._next_state is None:
+            actions = SimpleMiniGridEnv.Actions
+            width, height = self.grid.width - 2, self.grid.height - 2
+            x, y, d = np.meshgrid(np.arange(width), np.arange(height), np.arange(4), indexing='ij')
+
+            table = np.empty((width, height, 4, len(actions), 3), dtype=np.int64)
+            table[..., actions.left, :] = np.stack((x, y, (d - 1) % 4), axis=-1)
+            table[..., actions.right, :] = np.stack((x, y, (d + 1) % 4), axis=-1)
+
+            # Move forward unless there is a wall in front (outer walls keep indices in bounds)
+            fwd_x = x + DIR_VEC[d, 0]
+            fwd_y = y + DIR_VEC[d, 1]
+            blocked = self.is_wall(fwd_x + 1, fwd_y + 1)
+            table[..., actions.forward, :] = np.stack((np.where(blocked, x, fwd_x), np.where(blocked, y, fwd_y), d),
+                                                      axis=-1)
+
+            table.flags.writeable = False
+            self._next_state = table
+
+        return self._next_state
+
+    def goal_distances(self, state_goal_mapper):
+        """
+        Minimal number of actions to reach every free cell (as goal) from every state, as an int16 tensor indexed as
+        [goal, x, y, dir] where goal is the index of the goal cell in self.free_cells (see self.cell_index)
+        Unreachable goals are -1. Built on first call and shared by every environment using this layout
+        Only supported on layouts up to MAX_DISTANCE_CELLS cells, as the tensor grows with the square of the area
+        """
+
+        if self._goal_distances is None:
+            width, height = self.grid.width - 2, self.grid.height - 2
+            if width * height > MAX_DISTANCE_CELLS:
+                raise ValueError(f'Distance tensors are only supported on layouts up to {MAX_DISTANCE_CELLS} cells '
+                                 f'(e.g. 50x50), not {width}x{height}')
+            walkable = self.cell_index >= 0
+            distances = goal_distances(self.next_state, self.free_cells, state_goal_mapper, walkable)
+            distances.flags.writeable = False
+            self._goal_distances = distances
+        return self._goal_distances
+
+    def sample_state_goal(self, np_random, size=None):
+        """
+        Sample a random agent position and direction, and a different random goal position, among free cells
+        :param np_random: random number generator
+        :param size: number K of (position, direction, goal) samples, or None for a single one
+        :return: agent positions (K, 2), agent directions (K,), goal positions (K, 2)
+        """
+
+        n = len(self.free_cells)
+        agent_idx = np_random.randint(n, size=size)
+        agent_dir = np_random.randint(4, size=size)
+        # Shift by a non-zero offset so that the goal never lands on the agent position
+        goal_idx = (agent_idx + 1 + np_random.randint(n - 1, size=size)) % n
+
+        return self.free_cells[agent_idx], agent_dir, self.free_cells[goal_idx]
+
 
 class SimpleMiniGridEnv(gym.Env):
     """
@@ -229,6 +610,9 @@ class SimpleMiniGridEnv(gym.Env):
         'video.frames_per_second': 10
     }
 
+    # Static cache of pre-built layouts, keyed by (env class, width, height)
+    layout_cache = {}
+
     # Enumeration of possible actions
     class Actions(IntEnum):
         # Turn left, turn right, move forward
@@ -269,6 +653,14 @@ class SimpleMiniGridEnv(gym.Env):
         # Window to use for human rendering mode
         self.window = None
 
+        # Show human renders in a separate viewer process that never blocks the environment loop (see AsyncWindow)
+        self.async_viewer = False
+
+        # Framebuffer with the last rendered frame, which is only repainted where it changed (see self.render_frame)
+        # Changed cells are only tracked while there is a framebuffer
+        self.frame = self.frame_grid = self.frame_agent = None
+        self.dirty_cells = set()
+
         # Environment configuration
         self.width = width
         self.height = height
@@ -278,29 +670,240 @@ class SimpleMiniGridEnv(gym.Env):
         self.np_random = None
         self.seed(seed=seed)
 
+        # Report the level of the goal on the agent cell (-1 if none) in info['goal_level'] after each step
+        self.report_goal_level = False
+
+        # Stack of goals: positions, levels, and the encoding and goal level each one covered in the grid
+        self.goal_stack = self.goal_stack_levels = self.covered_encodings = self.covered_levels = None
+        self.num_goals = 0
+
+        # Level of the top goal of each cell in state coordinates, -1 for cells without goals
+        self.goal_levels = None
+
         # Initialize the environment
-        self.agent_pos = self.agent_dir = self.goal_pos = self.step_count = self.grid = self.goals = None
+        self.agent_pos = self.agent_dir = self.goal_pos = self.step_count = self.grid = None
+        self.last_action = self.last_reward = self.episode_return = None
+        self.layout = None
         self.reset()
 
     def reset(self):
-        raise NotImplementedError("Reset should be implemented by each environment type")
+        # Step count since episode start
+        self.step_count = 0
+        self.reset_step_info()
+
+        # Restore the static layout
+        self.load_layout()
+
+        # Select a random initial state and goal
+        self.reset_state_goal()
+
+        # Add goal
+        self.add_goal(self.goal_pos)
+
+        return self.state, self.goal_pos
+
+    def reset_to(self, state, goal_pos):
+        # Start a new episode from a given (x, y, dir) state and goal, e.g. to replay a recorded episode
+        self.step_count = 0
+        self.reset_step_info()
+        self.load_layout()
+
+        self.agent_pos = np.array(state[:2], dtype=int)
+        self.agent_dir = int(state[2])
+        self.goal_pos = np.array(goal_pos, dtype=int)
+
+        self.add_goal(self.goal_pos)
+
+        return self.state, self.goal_pos
+
+    def create_layout(self):
+        # Build self.grid with the static layout of the environment
+        raise NotImplementedError("Layout should be implemented by each environment type")
+
+    def get_layout(self):
+        # Get the layout for this env class and size, building it only the first time
+        key = (self.__class__, self.width, self.height)
+        if key not in self.layout_cache:
+            self.create_layout()
+            self.layout_cache[key] = Layout(self.grid)
+        return self.layout_cache[key]
+
+    def load_layout(self):
+        layout = self.get_layout()
+        if self.layout is layout:
+            # Grid already holds the layout: only remove goal overlays from previous episode
+            self.clear_goals()
+        else:
+            self.layout = layout
+            if layout.large:
+                # Per-environment memory must not grow with the grid size: goals only go to sparse overlays
+                self.grid = OverlayGrid(layout.grid)
+                self.goal_levels = SparseGoalLevels()
+            else:
+                self.grid = layout.grid.copy()
+                self.goal_levels = np.full((self.width, self.height), -1, dtype=np.int64)
+            self.num_goals = 0
+        return
 
     def add_goal(self, goal_pos, goal_level=None):
         # Place a goal at goal_pos
         # goal_level for visualization purposes
-        # Track previous object al goal_pos to restore visualization once goal is removed
-        if goal_level is None:
-            goal_level = self.goal_level
-        old_obj = self.put_object(Goal(goal_level), goal_pos)
-        self.goals.append((goal_pos, old_obj))
+        self.push_goal(int(goal_pos[0]), int(goal_pos[1]), self.num_goals if goal_level is None else int(goal_level))
         return
 
     def remove_goal(self):
         # Remove last added goal and restore previous object
-        goal_pos, obj_ = self.goals.pop()
-        self.put_object(obj_, goal_pos)
+        self.remove_goals(1)
+        return
+
+    def reserve_goals(self, size):
+        # Grow the stack arrays to hold at least size goals
+        if self.goal_levels is None:
+            # Environments without a static layout build their grids in reset(): start their goal levels lazily
+            self.goal_levels = np.full((self.width, self.height), -1, dtype=np.int64)
+        capacity = 0 if self.goal_stack is None else len(self.goal_stack)
+        if size <= capacity:
+            return
+        capacity = max(16, 2 * capacity, size)
+        start = self.num_goals
+        goal_stack, self.goal_stack = self.goal_stack, np.zeros((capacity, 2), dtype=np.int64)
+        goal_stack_levels, self.goal_stack_levels = self.goal_stack_levels, np.zeros(capacity, dtype=np.int64)
+        covered_encodings, self.covered_encodings = self.covered_encodings, np.zeros((capacity, 2), np.uint8)
+        covered_levels, self.covered_levels = self.covered_levels, np.zeros(capacity, dtype=np.int64)
+        if start:
+            self.goal_stack[:start] = goal_stack[:start]
+            self.goal_stack_levels[:start] = goal_stack_levels[:start]
+            self.covered_encodings[:start] = covered_encodings[:start]
+            self.covered_levels[:start] = covered_levels[:start]
         return
 
+    def push_goal(self, x, y, goal_level):
+        # Single goal version of add_goals, writing its cell directly (used on every reset)
+        start = self.num_goals
+        self.reserve_goals(start + 1)
+
+        self.goal_stack[start] = x, y
+        self.goal_stack_levels[start] = goal_level
+        self.covered_encodings[start] = self.grid.get_encoding(x + 1, y + 1)
+        self.covered_levels[start] = self.goal_levels[x, y]
+        self.num_goals = start + 1
+
+        self.grid.set_encoding(x + 1, y + 1, (OBJECT_TO_IDX['goal'], GOAL_COLOR_IDX[min(goal_level, 5)]))
+        self.goal_levels[x, y] = goal_level
+        if self.frame is not None:
+            self.dirty_cells.add((x + 1, y + 1))
+        return
+
+    def pop_goal(self):
+        # Single goal version of remove_goals, restoring its cell directly
+        start = self.num_goals - 1
+        x, y = self.goal_stack[start].tolist()
+        self.grid.set_encoding(x + 1, y + 1, self.covered_encodings[start])
+        self.goal_levels[x, y] = self.covered_levels[start]
+        if self.frame is not None:
+            self.dirty_cells.add((x + 1, y + 1))
+        self.num_goals = start
+        return
+
+    def add_goals(self, goal_pos, goal_levels=None):
+        """
+        Push a batch of goals on the goal stack, in order
+        Whatever each goal covers (cell contents and goal level) is tracked to restore it once the goal is removed
+        :param goal_pos: (k, 2) goal positions in state coordinates
+        :param goal_levels: (k,) levels for visualization purposes (by default, their positions in the stack)
+        """
+
+        goal_pos = np.asarray(goal_pos, dtype=np.int64).reshape(-1, 2)
+        k = len(goal_pos)
+        start, end = self.num_goals, self.num_goals + k
+        if goal_levels is None:
+            goal_levels = np.arange(start, end)
+        goal_levels = np.asarray(goal_levels, dtype=np.int64).reshape(k)
+
+        if k == 1 or isinstance(self.goal_levels, SparseGoalLevels):
+            # Goals pushed one by one stack the same way as a batch
+            for (x, y), goal_level in zip(goal_pos.tolist(), goal_levels.tolist()):
+                self.push_goal(x, y, goal_level)
+            return
+
+        self.reserve_goals(end)
+
+        x, y = goal_pos[:, 0], goal_pos[:, 1]
+        encodings = np.column_stack((np.full(k, OBJECT_TO_IDX['goal'], dtype=np.uint8),
+                                     GOAL_COLOR_IDX[np.minimum(goal_levels, 5)]))
+
+        # Goals cover the current cell, unless an earlier goal of the batch is on the same cell
+        cells = x * self.height + y
+        order = np.argsort(cells, kind='stable')
+        same_cell = cells[order][1:] == cells[order][:-1]
+        previous = np.full(k, -1)
+        previous[order[1:][same_cell]] = order[:-1][same_cell]
+        last = np.ones(k, dtype=bool)
+        last[order[:-1][same_cell]] = False
+
+        covered_encodings = self.grid.array[x + 1, y + 1]
+        covered_levels = self.goal_levels[x, y]
+        stacked = previous >= 0
+        covered_encodings[stacked] = encodings[previous[stacked]]
+        covered_levels[stacked] = goal_levels[previous[stacked]]
+
+        self.goal_stack[start:end] = goal_pos
+        self.goal_stack_levels[start:end] = goal_levels
+        self.covered_encodings[start:end] = covered_encodings
+        self.covered_levels[start:end] = covered_levels
+        self.num_goals = end
+
+        # The last goal of the batch on each cell is the visible one
+        self.grid.array[x[last] + 1, y[last] + 1] = encodings[last]
+        self.goal_levels[x[last], y[last]] = goal_levels[last]
+        if self.frame is not None:
+            self.dirty_cells.update(zip((x[last] + 1).tolist(), (y[last] + 1).tolist()))
+        return
+
+    def remove_goals(self, k):
+        # Pop the last k goals from the goal stack, restoring what they covered
+        k = min(k, self.num_goals)
+        if not k:
+            return
+        if k == 1 or isinstance(self.goal_levels, SparseGoalLevels):
+            for _ in range(k):
+                self.pop_goal()
+            return
+        start, end = self.num_goals - k, self.num_goals
+
+        # Each cell gets back what the first removed goal on it covered
+        goal_pos = self.goal_stack[start:end]
+        _, first = np.unique(goal_pos[:, 0] * self.height + goal_pos[:, 1], return_index=True)
+        x, y = goal_pos[first, 0], goal_pos[first, 1]
+        self.grid.array[x + 1, y + 1] = self.covered_encodings[start:end][first]
+        self.goal_levels[x, y] = self.covered_levels[start:end][first]
+        if self.frame is not None:
+            self.dirty_cells.update(zip((x + 1).tolist(), (y + 1).tolist()))
+
+        self.num_goals = start
+        return
+
+    def clear_goals(self):
+        # Remove every goal
+        self.remove_goals(self.num_goals)
+        return
+
+    @property
+    def goals(self):
+        # (num_goals, 2) positions of the stacked goals, bottom first
+        if self.goal_stack is None:
+            return np.zeros((0, 2), dtype=np.int64)
+        return self.goal_stack[:self.num_goals]
+
+    @goals.setter
+    def goals(self, goal_pos):
+        # Start a new goal stack without restoring any cell, e.g. after building a new grid in a custom reset()
+        # (as in `self.goals = list()`), then push the given goal positions if any
+        self.num_goals = 0
+        self.goal_levels = None
+        if len(goal_pos):
+            self.add_goals(goal_pos)
+
     def seed(self, seed=None):
         # Seed the random number generator
         self.np_random, _ = seeding.np_random(seed)
@@ -312,14 +915,22 @@ class SimpleMiniGridEnv(gym.Env):
 
     @property
     def goal_level(self):
-        return len(self.goals)
+        return self.num_goals
 
     def reset_state_goal(self):
+        if self.layout is not None:
+            # Draw from the free cells of the static layout
+            agent_pos, agent_dir, goal_pos = self.layout.sample_state_goal(self.np_random)
+            self.agent_pos = agent_pos.copy()
+            self.agent_dir = agent_dir
+            self.goal_pos = goal_pos.copy()
+            return
+
         # Pick a random position and direction for the agent
         while True:
             agent_x = self.np_random.randint(self.width)
             agent_y = self.np_random.randint(self.height)
-            if self.grid.get(*self.to_grid_coords(np.array((agent_x, agent_y)))) is None:
+            if self.grid.array[agent_x + 1, agent_y + 1, 0] == OBJECT_TO_IDX['empty']:
                 break
         agent_dir = self.np_random.randint(4)
 
@@ -327,7 +938,7 @@ class SimpleMiniGridEnv(gym.Env):
         while True:
             goal_x = self.np_random.randint(self.width)
             goal_y = self.np_random.randint(self.height)
-            if self.grid.get(*self.to_grid_coords(np.array((goal_x, goal_y)))) is None \
+            if self.grid.array[goal_x + 1, goal_y + 1, 0] == OBJECT_TO_IDX['empty'] \
                     and (agent_x, agent_y) != (goal_x, goal_y):
                 break
 
@@ -344,8 +955,19 @@ class SimpleMiniGridEnv(gym.Env):
         done = False
         info = {}
 
+        if self.layout is not None:
+            # Look up the next state in the transition table of the static layout
+            if not 0 <= action < len(self.actions):
+                raise ValueError('Action out of bounds')
+            if self.layout.large:
+                next_state = self.layout.transition(self.agent_pos[0], self.agent_pos[1], self.agent_dir, action)
+            else:
+                next_state = self.layout.next_state[self.agent_pos[0], self.agent_pos[1], self.agent_dir, action]
+            self.agent_pos = next_state[:2].copy()
+            self.agent_dir = next_state[2]
+
         # Rotate left
-        if action == self.actions.left:
+        elif action == self.actions.left:
             self.agent_dir = (self.agent_dir - 1) % 4
 
         # Rotate right
@@ -355,7 +977,8 @@ class SimpleMiniGridEnv(gym.Env):
         # Move forward
         elif action == self.actions.forward:
             fwd = self.agent_pos + DIR_TO_VEC[self.agent_dir]
-            if not isinstance(self.grid.get(*self.to_grid_coords(fwd)), Wall):
+            fwd_x, fwd_y = self.to_grid_coords(fwd)
+            if self.grid.array[fwd_x, fwd_y, 0] != OBJECT_TO_IDX['wall']:
                 self.agent_pos = fwd
 
         else:
@@ -369,11 +992,21 @@ class SimpleMiniGridEnv(gym.Env):
             done = True
             reward = 0
 
+        # Last step info, shown in the caption of human renders
+        self.last_action = action
+        self.last_reward = reward
+        self.episode_return += reward
+
+        if self.report_goal_level:
+            info['goal_level'] = int(self.goal_levels[self.agent_pos[0], self.agent_pos[1]])
+
         return self.state, reward, done, info
 
-    def render(self, mode='human', close=False, tile_size=32):
+    def render(self, mode='human', close=False, tile_size=32, viewport=None):
         """
-        Render the whole-grid human view
+        Render the whole-grid human view, or only a viewport of it
+        :param viewport: (width, height) in cells of a crop centered on the agent, or an explicit (x0, y0, x1, y1)
+            window of grid cells (outer walls included). Large grids use LARGE_GRID_VIEWPORT by default
         """
 
         if close:
@@ -382,25 +1015,89 @@ class SimpleMiniGridEnv(gym.Env):
             return
 
         if mode == 'human' and not self.window:
-            from .window import Window
-            self.window = Window(self.name)
+            from .window import AsyncWindow, Window
+            self.window = AsyncWindow(self.name) if self.async_viewer else Window(self.name)
             self.window.show(block=False)
 
-        # Render the whole grid
-        img = self.grid.render(tile_size, self.to_grid_coords(self.agent_pos), self.agent_dir)
+        if viewport is None and self.layout is not None and self.layout.large:
+            viewport = LARGE_GRID_VIEWPORT
+
+        if viewport is None:
+            # Render the whole grid
+            img = self.render_frame(tile_size).copy()
+        else:
+            # Draw only the tiles in the viewport
+            if self.layout is not None and self.layout.large:
+                # Drop any whole-grid framebuffer of large grids, and the cells it would have to repaint
+                self.frame = self.frame_grid = self.frame_agent = None
+                self.dirty_cells.clear()
+            agent_pos = self.to_grid_coords(self.agent_pos)
+            img = self.grid.render(tile_size, agent_pos, self.agent_dir, self.viewport_window(viewport))
 
         if mode == 'human':
-            # TODO add real-time info about last step (obs, action, reward, ...)
-            # self.window.set_caption(_)
-            self.window.show_img(img)
+            self.window.show_img(img, self.caption())
 
         return img
 
+    def reset_step_info(self):
+        self.last_action = None
+        self.last_reward = 0
+        self.episode_return = 0
+        return
+
+    def caption(self):
+        # Real-time info about the last step
+        action = '-' if self.last_action is None else self.actions(self.last_action).name
+        return (f'Step {self.step_count:3}/{self.max_steps}    Action = {action:7}    Reward = {self.last_reward:2}    '
+                f'Return = {self.episode_return}')
+
+    def viewport_window(self, viewport):
+        # (x0, y0, x1, y1) window of grid cells for a viewport, clipped to the grid
+        if len(viewport) == 4:
+            x0, y0, x1, y1 = viewport
+            return max(x0, 0), max(y0, 0), min(x1, self.grid.width), min(y1, self.grid.height)
+
+        width, height = min(viewport[0], self.grid.width), min(viewport[1], self.grid.height)
+        agent_x, agent_y = self.to_grid_coords(self.agent_pos)
+        x0 = int(np.clip(agent_x - width // 2, 0, self.grid.width - width))
+        y0 = int(np.clip(agent_y - height // 2, 0, self.grid.height - height))
+        return x0, y0, x0 + width, y0 + height
+
+    def render_frame(self, tile_size=32):
+        """
+        Update the framebuffer to the current grid and agent state, and return it
+        The whole grid is rendered only when the grid or tile size change. Otherwise, only the tiles that changed since
+        last frame are repainted: the old and new agent cells, and the cells modified through self.put_object
+        """
+
+        agent_pos = tuple(self.to_grid_coords(self.agent_pos))
+        agent = (agent_pos, self.agent_dir)
+
+        size_changed = self.frame is not None and self.frame.shape[0] != self.grid.height * tile_size
+        if self.frame is None or self.frame_grid is not self.grid or size_changed:
+            self.frame = self.grid.render(tile_size, agent_pos, self.agent_dir)
+            self.frame_grid = self.grid
+        else:
+            dirty_cells = self.dirty_cells
+            if agent != self.frame_agent:
+                dirty_cells.update((self.frame_agent[0], agent_pos))
+            for cell in dirty_cells:
+                agent_dir = self.agent_dir if cell == agent_pos else None
+                self.grid.render_cell(self.frame, tile_size, *cell, agent_dir=agent_dir)
+
+        self.frame_agent = agent
+        self.dirty_cells.clear()
+        return self.frame
+
     def close(self):
         if self.window:
             self.window.close()
         return
 
+    def perf_stats(self):
+        # Snapshot of the instrumentation stats of this environment (see profiling.py)
+        return profiling.perf_stats(self)
+
     def create_grid(self, width, height):
         # Add two extra rows/cols for outer walls
         self.grid = Grid(width + 2, height + 2)
@@ -411,7 +1108,10 @@ class SimpleMiniGridEnv(gym.Env):
         return
 
     def put_object(self, obj, pos):
-        old_obj = self.grid.set(*self.to_grid_coords(pos), obj)
+        grid_pos = self.to_grid_coords(pos)
+        old_obj = self.grid.set(*grid_pos, obj)
+        if self.frame is not None:
+            self.dirty_cells.add(tuple(grid_pos))
         return old_obj
 
     @staticmethod
@@ -423,7 +1123,49 @@ class SimpleMiniGridEnv(gym.Env):
     @property
     def state_goal_mapper(self):
         # A goal is defined as (x-coor, y-coor), independently of orientation
+        # Also maps arrays of states (..., 3) to arrays of goals (..., 2)
         def fn(state):
-            return state[:2]
+            return state[..., :2]
 
         return fn
+
+    def distance(self, state, goal):
+        """
+        Minimal number of actions to reach goal from state (-1 if unreachable), from the distance tensor of the layout
+        Also works with arrays of states (..., 3) and goals (..., 2)
+        """
+
+        state = np.asarray(state)
+        goal = np.asarray(goal)
+        distances = self.layout.goal_distances(self.state_goal_mapper)
+
+        # Negative coordinates would silently wrap around the tensor
+        for name, cells in (('States', state), ('Goals', goal)):
+            if np.any((cells[..., :2] < 0) | (cells[..., :2] >= (self.width, self.height))):
+                raise ValueError(f'{name} must be inside the {self.width}x{self.height} grid')
+        if np.any((state[..., 2] < 0) | (state[..., 2] >= 4)):
+            raise ValueError('State directions must be in [0, 4)')
+
+        goal_idx = self.layout.cell_index[goal[..., 0], goal[..., 1]]
+        if np.any(goal_idx < 0):
+            raise ValueError('Goals must be free cells of the layout')
+        return distances[goal_idx, state[..., 0], state[..., 1], state[..., 2]]
+
+    def optimal_action_mask(self, state, goal):
+        """
+        Boolean mask (..., 3) of the actions that reduce the distance to goal by one, for arrays of states and goals
+        All actions are False once the goal is achieved or if it is unreachable
+        """
+
+        state = np.asarray(state)
+        goal = np.asarray(goal)
+        dist = self.distance(state, goal)[..., None]
+        next_states = self.layout.next_state[state[..., 0], state[..., 1], state[..., 2]]
+        return (dist > 0) & (self.distance(next_states, goal[..., None, :]) == dist - 1)
+
+    def optimal_actions(self, state, goal):
+        """
+        Actions (as an array of integers) that follow a shortest path from state to goal
+        """
+
+        return np.flatnonzero(self.optimal_action_mask(state, goal))
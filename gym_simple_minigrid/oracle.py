@@ -0,0 +1,68 @@
+import numpy as np
+
+# Number of (goal, state) pairs searched at once by goal_distances, which bounds its temporary memory
+BFS_BLOCK_PAIRS = 1 << 20
+
+
+def goal_distances(next_state, goal_cells, state_goal_mapper, walkable):
+    """
+    Minimal number of actions needed to reach each goal cell from every state, computed with a backward breadth-first
+    search run for all goals at once (multi-source: every state mapped to the goal cell is a source)
+    :param next_state: transition table indexed as [x, y, dir, action] holding the next (x, y, dir)
+    :param goal_cells: (G, 2) goal cells
+    :param state_goal_mapper: function mapping an (..., 3) array of states to their (..., 2) achieved goals
+    :param walkable: (width, height) boolean mask of the cells the agent can stand on
+    :return: (G, width, height, 4) int16 distances, -1 where the goal cannot be reached
+    """
+
+    width, height, num_dirs, num_actions, _ = next_state.shape
+    num_states = width * height * num_dirs
+    num_goals = len(goal_cells)
+
+    def flat_index(states):
+        return (states[..., 0] * height + states[..., 1]) * num_dirs + states[..., 2]
+
+    # Reverse transition graph in CSR format: predecessors of state s are pred[indptr[s]:indptr[s + 1]]
+    # Only transitions starting from walkable cells are kept
+    states = np.stack(np.meshgrid(np.arange(width), np.arange(height), np.arange(num_dirs), indexing='ij'), axis=-1)
+    src = np.repeat(flat_index(states).ravel(), num_actions)
+    dst = flat_index(next_state).ravel()
+    keep = np.repeat(walkable[states[..., 0], states[..., 1]].ravel(), num_actions)
+    src, dst = src[keep], dst[keep]
+    order = np.argsort(dst, kind='stable')
+    pred = src[order]
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(dst, minlength=num_states))))
+
+    # Sources: (goal, state) pairs whose state achieves the goal
+    goal_index = np.full((width, height), -1)
+    goal_index[goal_cells[:, 0], goal_cells[:, 1]] = np.arange(num_goals)
+    achieved = np.asarray(state_goal_mapper(states.reshape(-1, 3)))
+    source_goal = goal_index[achieved[:, 0], achieved[:, 1]]
+    source_state = np.flatnonzero((source_goal >= 0) & walkable[states[..., 0], states[..., 1]].ravel())
+
+    # The search runs over blocks of goals, each written in place into its slice of the distance tensor, so that the
+    # frontier temporaries stay bounded by the block size instead of the number of goals
+    dist = np.full((num_goals, num_states), -1, dtype=np.int16)
+    block = max(1, BFS_BLOCK_PAIRS // num_states)
+    for first in range(0, num_goals, block):
+        in_block = (source_goal[source_state] >= first) & (source_goal[source_state] < first + block)
+        block_dist = dist[first:first + block].reshape(-1)
+
+        # Frontier of (goal, state) pairs of the block encoded as (goal - first) * num_states + state
+        frontier = (source_goal[source_state[in_block]] - first) * num_states + source_state[in_block]
+        level = 0
+        while len(frontier):
+            block_dist[frontier] = level
+            level += 1
+
+            # Expand every pair of the frontier to all predecessors of its state
+            goal, state = np.divmod(frontier, num_states)
+            counts = indptr[state + 1] - indptr[state]
+            starts = np.repeat(indptr[state] - np.cumsum(counts) + counts, counts)
+            preds = pred[starts + np.arange(counts.sum())]
+            candidates = np.repeat(goal, counts) * num_states + preds
+
+            # Keep unvisited pairs only
+            frontier = np.unique(candidates[block_dist[candidates] < 0])
+
+    return dist.reshape(num_goals, width, height, num_dirs)
@@ -0,0 +1,407 @@
+import gym
+import multiprocessing as mp
+import numpy as np
+from . import profiling
+from .batch_rendering import viewport_size
+from .minigrid import LARGE_GRID_VIEWPORT
+from .register import env_list
+
+# Commands sent by the main process to the workers
+STEP, RESET, CLOSE, PERF_STATS = range(4)
+
+
+def shared_buffer(ctx, shape, dtype):
+    # Allocate a shared-memory buffer; returned as (raw array, dtype, shape) so it can be passed to worker processes
+    dtype = np.dtype(dtype)
+    raw = ctx.RawArray('b', max(int(np.prod(shape)) * dtype.itemsize, 1))
+    return raw, dtype, shape
+
+
+def as_array(buffer):
+    # NumPy view of a shared-memory buffer
+    raw, dtype, shape = buffer
+    return np.frombuffer(raw, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+
+def worker(env_id, env_slice, seed, buffers, command, barrier, tile_size, viewport, stats_queue, profile):
+    """
+    Step a chunk of environments with a SimpleMiniGridVecEnv, reading actions from and writing results to shared memory
+    """
+
+    from .vector import SimpleMiniGridVecEnv
+
+    try:
+        # Forked workers start with a copy of the stats of the main process
+        profiling.stats.clear()
+        if profile:
+            profiling.enable()
+        envs = SimpleMiniGridVecEnv(env_id, env_slice.stop - env_slice.start, seed=seed)
+        arrays = {name: as_array(buffer)[env_slice] for name, buffer in buffers.items()}
+
+        while True:
+            barrier.wait()
+            if command.value == CLOSE:
+                break
+
+            if command.value == PERF_STATS:
+                stats_queue.put(envs.perf_stats())
+            elif command.value == STEP:
+                states, rewards, dones, truncated = envs.step(arrays['actions'])
+                arrays['rewards'][:] = rewards
+                arrays['dones'][:] = dones
+                arrays['truncated'][:] = truncated
+            else:
+                states, _ = envs.reset()
+                arrays['rewards'][:] = 0
+                arrays['dones'][:] = False
+                arrays['truncated'][:] = False
+
+            if command.value != PERF_STATS:
+                arrays['states'][:] = states
+                arrays['final_states'][:] = envs.final_states
+                arrays['goals'][:] = envs.goal_pos
+                if 'frames' in arrays:
+                    envs.render(tile_size, out=arrays['frames'], viewport=viewport)
+
+            barrier.wait()
+    except BaseException:
+        # Release the main process (and other workers) instead of leaving them blocked at the barrier
+        barrier.abort()
+        raise
+
+
+class SharedMemoryVecEnv:
+    """
+    Multiprocess vectorized version of any registered Simple-MiniGrid env
+    Each worker process steps a contiguous chunk of the environments (as a SimpleMiniGridVecEnv) and writes states,
+    goals, rewards, dones, truncation flags and, optionally, rendered frames straight into shared-memory NumPy arrays.
+    Actions are read from shared memory as well, so nothing is pickled per step: each batch step only waits twice on a
+    single barrier (start and end of the step)
+    """
+
+    def __init__(self, env_id, num_envs, num_workers=None, seed=9, render=False, tile_size=32, viewport=None,
+                 context=None):
+        """
+        :param env_id: id registered through gym_simple_minigrid.register
+        :param num_envs: total number of environments N
+        :param num_workers: number of worker processes (CPU count by default)
+        :param seed: base seed, worker w uses seed + w
+        :param render: also render rgb_array frames of every environment into self.frames after each step
+        :param tile_size: tile size for rendered frames
+        :param viewport: optional viewport of rendered frames (see BatchRenderer.render). Large grids use
+            LARGE_GRID_VIEWPORT by default
+        :param context: multiprocessing context or start method name (platform default if None)
+        """
+
+        assert env_id in env_list, f'{env_id} is not a registered Simple-MiniGrid environment'
+
+        if num_workers is None:
+            num_workers = mp.cpu_count()
+        num_workers = min(num_workers, num_envs)
+        ctx = mp.get_context(context)
+
+        self.num_envs = num_envs
+        self.num_workers = num_workers
+
+        # Shape of rendered frames, from a local copy of the env
+        env = gym.make(env_id).unwrapped
+        self.name = env.name
+        self.single_action_space = env.action_space
+        self.single_observation_space = env.observation_space
+        if viewport is None and env.layout.large:
+            viewport = LARGE_GRID_VIEWPORT
+        view_width, view_height = viewport_size(viewport, env.grid.width, env.grid.height)
+        frame_shape = (view_height * tile_size, view_width * tile_size, 3)
+        env.close()
+
+        # Shared-memory buffers
+        self.buffers = {
+            'actions': shared_buffer(ctx, (num_envs,), np.int64),
+            'states': shared_buffer(ctx, (num_envs, 3), np.int64),
+            'final_states': shared_buffer(ctx, (num_envs, 3), np.int64),
+            'goals': shared_buffer(ctx, (num_envs, 2), np.int64),
+            'rewards': shared_buffer(ctx, (num_envs,), np.int64),
+            'dones': shared_buffer(ctx, (num_envs,), np.bool_),
+            'truncated': shared_buffer(ctx, (num_envs,), np.bool_),
+        }
+        if render:
+            self.buffers['frames'] = shared_buffer(ctx, (num_envs,) + frame_shape, np.uint8)
+        for name, buffer in self.buffers.items():
+            setattr(self, name, as_array(buffer))
+        if not render:
+            self.frames = None
+
+        self.command = ctx.RawValue('i', RESET)
+        self.barrier = ctx.Barrier(num_workers + 1)
+        self.stats_queue = ctx.SimpleQueue()
+
+        # Split environments into contiguous chunks, one per worker
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        self.processes = []
+        for w in range(num_workers):
+            env_slice = slice(int(bounds[w]), int(bounds[w + 1]))
+            worker_seed = None if seed is None else seed + w
+            process = ctx.Process(target=worker, daemon=True,
+                                  args=(env_id, env_slice, worker_seed, self.buffers, self.command, self.barrier,
+                                        tile_size, viewport, self.stats_queue, profiling.is_enabled()))
+            process.start()
+            self.processes.append(process)
+        self.closed = False
+
+    def run(self, command):
+        # Run a command on every worker and wait until all of them are done
+        self.command.value = command
+        self.barrier.wait()
+        self.barrier.wait()
+        return
+
+    def reset(self):
+        self.run(RESET)
+        return self.states.copy(), self.goals.copy()
+
+    def step(self, actions):
+        """
+        Step all environments with an (N,) array of actions (same semantics as SimpleMiniGridVecEnv.step)
+        Goals of the new episodes are in self.goals, and frames (if enabled) in self.frames
+        :return: states (N, 3), rewards (N,), dones (N,), truncated (N,)
+        """
+
+        actions = np.asarray(actions)
+        if ((actions < 0) | (actions >= self.single_action_space.n)).any():
+            raise ValueError('Action out of bounds')
+
+        self.actions[:] = actions
+        self.run(STEP)
+        return self.states.copy(), self.rewards.copy(), self.dones.copy(), self.truncated.copy()
+
+    def perf_stats(self):
+        # Instrumentation stats of the environments of every worker, summed (see profiling.py)
+        self.run(PERF_STATS)
+        return profiling.PerfStats.merge(self.stats_queue.get() for _ in self.processes)
+
+    def close(self):
+        if self.closed:
+            return
+        self.command.value = CLOSE
+        if not self.barrier.broken:
+            self.barrier.wait()
+        for process in self.processes:
+            process.join()
+        self.closed = True
+        return
+
+
+def async_worker(env_id, env_slice, seed, buffers, tasks, results, profile):
+    """
+    Serve step/reset tasks for a chunk of environments: each task is (command, local env ids), and the global ids of
+    the envs are sent back through the results queue once their results are in shared memory (as (ids, exception) if
+    the task failed)
+    """
+
+    from .vector import SimpleMiniGridVecEnv
+
+    profiling.stats.clear()
+    if profile:
+        profiling.enable()
+    envs = SimpleMiniGridVecEnv(env_id, env_slice.stop - env_slice.start, seed=seed)
+    arrays = {name: as_array(buffer)[env_slice] for name, buffer in buffers.items()}
+
+    while True:
+        command, ids = tasks.get()
+        if command == CLOSE:
+            break
+        if command == PERF_STATS:
+            results.put(envs.perf_stats())
+            continue
+
+        try:
+            if command == STEP:
+                states, rewards, dones, truncated = envs.step(arrays['actions'][ids], env_ids=ids)
+                arrays['rewards'][ids] = rewards
+                arrays['dones'][ids] = dones
+                arrays['truncated'][ids] = truncated
+            else:
+                envs.reset_envs(ids)
+                envs.final_states[ids] = states = envs.state[ids]
+                arrays['rewards'][ids] = 0
+                arrays['dones'][ids] = False
+                arrays['truncated'][ids] = False
+
+            arrays['states'][ids] = states
+            arrays['final_states'][ids] = envs.final_states[ids]
+            arrays['goals'][ids] = envs.goal_pos[ids]
+            results.put(ids + env_slice.start)
+        except Exception as e:
+            results.put((ids + env_slice.start, e))
+
+
+class AsyncVecEnv:
+    """
+    Asynchronous (envpool-style) vectorized version of any registered Simple-MiniGrid env
+    send(actions, env_ids) hands actions to the worker processes owning those envs and returns immediately, and recv()
+    returns the first batch_size envs whose step finished, with their ids. The policy can then run on a batch while
+    the other envs are still being stepped. Actions and results go through shared memory: only env ids are queued
+    """
+
+    def __init__(self, env_id, num_envs, batch_size=None, num_workers=None, seed=9, context=None):
+        """
+        :param env_id: id registered through gym_simple_minigrid.register
+        :param num_envs: total number of environments N
+        :param batch_size: number of envs returned by each recv() (N by default)
+        :param num_workers: number of worker processes (CPU count by default)
+        :param seed: base seed, worker w uses seed + w
+        :param context: multiprocessing context or start method name (platform default if None)
+        """
+
+        assert env_id in env_list, f'{env_id} is not a registered Simple-MiniGrid environment'
+
+        if num_workers is None:
+            num_workers = mp.cpu_count()
+        num_workers = min(num_workers, num_envs)
+        ctx = mp.get_context(context)
+
+        self.num_envs = num_envs
+        self.batch_size = num_envs if batch_size is None else batch_size
+        self.num_workers = num_workers
+
+        env = gym.make(env_id).unwrapped
+        self.name = env.name
+        self.single_action_space = env.action_space
+        self.single_observation_space = env.observation_space
+        env.close()
+
+        # Shared-memory buffers
+        self.buffers = {
+            'actions': shared_buffer(ctx, (num_envs,), np.int64),
+            'states': shared_buffer(ctx, (num_envs, 3), np.int64),
+            'final_states': shared_buffer(ctx, (num_envs, 3), np.int64),
+            'goals': shared_buffer(ctx, (num_envs, 2), np.int64),
+            'rewards': shared_buffer(ctx, (num_envs,), np.int64),
+            'dones': shared_buffer(ctx, (num_envs,), np.bool_),
+            'truncated': shared_buffer(ctx, (num_envs,), np.bool_),
+        }
+        for name, buffer in self.buffers.items():
+            setattr(self, name, as_array(buffer))
+
+        # Split environments into contiguous chunks, one per worker
+        self.bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        self.results = ctx.SimpleQueue()
+        self.tasks = []
+        self.processes = []
+        for w in range(num_workers):
+            env_slice = slice(int(self.bounds[w]), int(self.bounds[w + 1]))
+            worker_seed = None if seed is None else seed + w
+            tasks = ctx.SimpleQueue()
+            process = ctx.Process(target=async_worker, daemon=True,
+                                  args=(env_id, env_slice, worker_seed, self.buffers, tasks, self.results,
+                                        profiling.is_enabled()))
+            process.start()
+            self.tasks.append(tasks)
+            self.processes.append(process)
+
+        # Ids of envs whose results arrived but were not returned by recv() yet, number of envs still running and
+        # whether each env was sent a task whose results were not returned yet
+        self.ready = []
+        self.num_pending = 0
+        self.in_flight = np.zeros(num_envs, dtype=bool)
+        self.closed = False
+
+    def check_idle(self, env_ids):
+        # Refuse to start envs that are given twice or whose previous results were not returned by recv() yet
+        if len(np.unique(env_ids)) != len(env_ids):
+            raise ValueError('Duplicate env ids')
+        if self.in_flight[env_ids].any():
+            raise ValueError(f'Envs {env_ids[self.in_flight[env_ids]].tolist()} are still pending, call recv() first')
+        return
+
+    def dispatch(self, command, env_ids):
+        # Send a task to the owner of each env in env_ids
+        owners = np.searchsorted(self.bounds, env_ids, side='right') - 1
+        for w in np.unique(owners):
+            self.tasks[w].put((command, env_ids[owners == w] - self.bounds[w]))
+        self.num_pending += len(env_ids)
+        self.in_flight[env_ids] = True
+        return
+
+    def async_reset(self, env_ids=None):
+        # Start resetting env_ids (all envs by default); results are returned by recv()
+        env_ids = np.arange(self.num_envs) if env_ids is None else np.asarray(env_ids)
+        self.check_idle(env_ids)
+        self.dispatch(RESET, env_ids)
+        return
+
+    def reset(self):
+        # Reset all envs and wait for them
+        self.async_reset()
+        batch = self.recv(self.num_envs)
+        order = np.argsort(batch[-1])
+        return batch[0][order], batch[1][order]
+
+    def send(self, actions, env_ids=None):
+        """
+        Start stepping env_ids (all envs by default) with one action each, without waiting for the results
+        An env must not be sent new actions before its previous results have been returned by recv() (ValueError)
+        """
+
+        env_ids = np.arange(self.num_envs) if env_ids is None else np.asarray(env_ids)
+        actions = np.asarray(actions)
+        if actions.shape != env_ids.shape:
+            raise ValueError(f'Expected {len(env_ids)} actions, got shape {actions.shape}')
+        if ((actions < 0) | (actions >= self.single_action_space.n)).any():
+            raise ValueError('Action out of bounds')
+        self.check_idle(env_ids)
+
+        self.actions[env_ids] = actions
+        self.dispatch(STEP, env_ids)
+        return
+
+    def recv(self, batch_size=None):
+        """
+        Wait until batch_size envs (self.batch_size by default, at most all pending ones) have finished their step
+        Same semantics as SimpleMiniGridVecEnv.step for every returned env
+        :return: states (B, 3), goals (B, 2), rewards (B,), dones (B,), truncated (B,), env_ids (B,)
+        """
+
+        if batch_size is None:
+            batch_size = self.batch_size
+        batch_size = min(batch_size, self.num_pending + sum(len(ids) for ids in self.ready))
+
+        num_ready = sum(len(ids) for ids in self.ready)
+        while num_ready < batch_size:
+            ids = self.results.get()
+            if isinstance(ids, tuple):
+                # Failed task: its envs are no longer running and can be sent new tasks
+                failed, error = ids
+                self.num_pending -= len(failed)
+                self.in_flight[failed] = False
+                raise error
+            self.ready.append(ids)
+            self.num_pending -= len(ids)
+            num_ready += len(ids)
+
+        ready = np.concatenate(self.ready) if self.ready else np.zeros(0, dtype=int)
+        env_ids, rest = ready[:batch_size], ready[batch_size:]
+        self.ready = [rest] if len(rest) else []
+        self.in_flight[env_ids] = False
+
+        return (self.states[env_ids], self.goals[env_ids], self.rewards[env_ids], self.dones[env_ids],
+                self.truncated[env_ids], env_ids)
+
+    def perf_stats(self):
+        # Instrumentation stats of the environments of every worker, summed (see profiling.py)
+        # Results of all sent steps must have been received first, as they share the results queue
+        if self.num_pending:
+            raise RuntimeError('Cannot collect stats while steps are pending, call recv() first')
+        for tasks in self.tasks:
+            tasks.put((PERF_STATS, None))
+        return profiling.PerfStats.merge(self.results.get() for _ in self.processes)
+
+    def close(self):
+        if self.closed:
+            return
+        for tasks in self.tasks:
+            tasks.put((CLOSE, None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
+        return
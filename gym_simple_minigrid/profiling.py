@@ -0,0 +1,202 @@
+import functools
+import os
+import time
+import weakref
+
+# Environment variable enabling instrumentation when the package is imported (e.g. in worker processes)
+PROFILE_ENV = 'SIMPLE_MINIGRID_PROFILE'
+
+
+class PerfStats:
+    """
+    Call counts and cumulative wall-clock time (in nanoseconds) of instrumented methods, plus event counters (e.g. tile
+    atlas hits and misses). Stats of several environments or processes can be summed with + or PerfStats.merge
+    """
+
+    def __init__(self, calls=None, time_ns=None, counters=None):
+        self.calls = dict(calls or {})
+        self.time_ns = dict(time_ns or {})
+        self.counters = dict(counters or {})
+
+    def record(self, name, elapsed_ns):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.time_ns[name] = self.time_ns.get(name, 0) + elapsed_ns
+        return
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+        return
+
+    def clear(self):
+        self.calls.clear()
+        self.time_ns.clear()
+        self.counters.clear()
+        return
+
+    def snapshot(self):
+        return PerfStats(self.calls, self.time_ns, self.counters)
+
+    def __add__(self, other):
+        total = self.snapshot()
+        for field in ('calls', 'time_ns', 'counters'):
+            totals = getattr(total, field)
+            for name, value in getattr(other, field).items():
+                totals[name] = totals.get(name, 0) + value
+        return total
+
+    @classmethod
+    def merge(cls, stats):
+        return sum(stats, cls())
+
+    def as_dict(self):
+        return {'calls': dict(self.calls), 'time_ns': dict(self.time_ns), 'counters': dict(self.counters)}
+
+    def __repr__(self):
+        lines = [f'{"method":40} {"calls":>12} {"total ms":>12} {"us/call":>10}']
+        for name in sorted(self.time_ns, key=self.time_ns.get, reverse=True):
+            calls, elapsed = self.calls[name], self.time_ns[name]
+            lines.append(f'{name:40} {calls:12,} {elapsed / 1e6:12.2f} {elapsed / 1e3 / calls:10.2f}')
+        for name in sorted(self.counters):
+            lines.append(f'{name:40} {self.counters[name]:12,}')
+        return '\n'.join(lines)
+
+
+# Stats of this process
+stats = PerfStats()
+
+# Stats of each environment instance, and the environments whose instrumented methods are running (innermost last)
+# Calls made on behalf of an environment (e.g. Grid.render, tile atlas lookups) are also counted in its stats
+instance_stats = weakref.WeakKeyDictionary()
+active = []
+
+# Original methods replaced while instrumentation is enabled, keyed by (class, method name)
+originals = {}
+
+
+def instrumented_methods():
+    # (class, method name) pairs timed while instrumentation is enabled
+    from .batch_rendering import BatchRenderer
+    from .minigrid import Grid, SimpleMiniGridEnv
+    from .vector import SimpleMiniGridVecEnv
+
+    env_methods = ['reset', 'step', 'load_layout', 'reset_state_goal', 'render', 'render_frame']
+    return [(SimpleMiniGridEnv, name) for name in env_methods] + [
+        (Grid, 'render'),
+        (Grid, 'render_cell'),
+        (SimpleMiniGridVecEnv, 'reset'),
+        (SimpleMiniGridVecEnv, 'step'),
+        (SimpleMiniGridVecEnv, 'reset_envs'),
+        (SimpleMiniGridVecEnv, 'render'),
+        (BatchRenderer, 'render'),
+    ]
+
+
+def owners():
+    # Classes whose instances keep their own stats (see instance_stats)
+    from .minigrid import SimpleMiniGridEnv
+    from .vector import SimpleMiniGridVecEnv
+
+    return SimpleMiniGridEnv, SimpleMiniGridVecEnv
+
+
+def current_stats():
+    # Stats of the environment being run, if any
+    if not active:
+        return None
+    owner = active[-1]
+    if owner not in instance_stats:
+        instance_stats[owner] = PerfStats()
+    return instance_stats[owner]
+
+
+def count(name, n=1):
+    # Count an event in the stats of this process and of the environment being run
+    stats.count(name, n)
+    owner_stats = current_stats()
+    if owner_stats is not None:
+        owner_stats.count(name, n)
+    return
+
+
+def timed(name, method, owner=False):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if owner:
+            active.append(self)
+        start = time.perf_counter_ns()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            stats.record(name, elapsed)
+            owner_stats = current_stats()
+            if owner_stats is not None:
+                owner_stats.record(name, elapsed)
+            if owner:
+                active.pop()
+    return wrapper
+
+
+def enable():
+    """
+    Start instrumenting: hot-path methods are replaced by timed versions and tile atlas lookups are counted
+    Nothing is patched while instrumentation is disabled, so it costs nothing by default
+    """
+
+    from .minigrid import TileAtlas
+
+    if originals:
+        return
+
+    for cls, name in instrumented_methods():
+        originals[cls, name] = cls.__dict__[name]
+        setattr(cls, name, timed(f'{cls.__name__}.{name}', cls.__dict__[name], issubclass(cls, owners())))
+
+    # Tile atlas lookups: every looked up tile is a hit unless it has to be drawn
+    get_tile, draw_missing, draw = TileAtlas.get_tile, TileAtlas.draw_missing, TileAtlas.draw
+    originals[TileAtlas, 'get_tile'], originals[TileAtlas, 'draw_missing'] = get_tile, draw_missing
+    originals[TileAtlas, 'draw'] = draw
+
+    def count_get_tile(self, *args, **kwargs):
+        count('TileAtlas.lookups')
+        return get_tile(self, *args, **kwargs)
+
+    def count_draw_missing(self, indices):
+        count('TileAtlas.lookups', indices.size)
+        return draw_missing(self, indices)
+
+    def count_draw(self, k):
+        count('TileAtlas.misses')
+        return draw(self, k)
+
+    TileAtlas.get_tile, TileAtlas.draw_missing, TileAtlas.draw = count_get_tile, count_draw_missing, count_draw
+    return
+
+
+def disable():
+    # Restore the original methods (collected stats are kept)
+    for (cls, name), method in originals.items():
+        setattr(cls, name, method)
+    originals.clear()
+    return
+
+
+def is_enabled():
+    return bool(originals)
+
+
+def perf_stats(instance=None):
+    """
+    Snapshot of the stats of this process, or only of an environment instance, with TileAtlas.hits derived from
+    lookups and misses
+    """
+
+    snapshot = (stats if instance is None else instance_stats.get(instance, PerfStats())).snapshot()
+    lookups = snapshot.counters.get('TileAtlas.lookups', 0)
+    if lookups:
+        snapshot.counters['TileAtlas.hits'] = lookups - snapshot.counters.get('TileAtlas.misses', 0)
+    return snapshot
+
+
+if os.environ.get(PROFILE_ENV):
+    enable()
@@ -0,0 +1,233 @@
+import json
+import os
+import gym
+import numpy as np
+
+# Fixed-width columns of a recorded transition: name -> (dtype, shape of one row)
+# state is the state the action was taken from and next_state the one it led to (before any reset)
+# first marks the first transition after each reset, which delimits episodes (including unfinished ones)
+COLUMNS = {
+    'state': (np.int16, (3,)),
+    'goal': (np.int16, (2,)),
+    'action': (np.int8, ()),
+    'reward': (np.int8, ()),
+    'next_state': (np.int16, (3,)),
+    'done': (np.bool_, ()),
+    'truncated': (np.bool_, ()),
+    'first': (np.bool_, ()),
+}
+
+META_FILE = 'meta.json'
+
+
+def column_path(path, shard, name):
+    return os.path.join(path, f'{shard:05d}.{name}.bin')
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    """
+    Wrapper streaming every transition of a Simple-MiniGrid environment to disk
+    Transitions are buffered in chunks of fixed-width int8/int16 columns, and every full chunk is appended to one raw
+    file per column. A new shard (set of column files) is started once the current one exceeds max_shard_bytes, so that
+    shards can be memory-mapped, copied or deleted independently. Read them back with TrajectoryReader
+    """
+
+    def __init__(self, env, path, chunk_size=4096, max_shard_bytes=2 ** 28):
+        """
+        :param env: Simple-MiniGrid environment to record
+        :param path: directory of the recording; transitions are appended to any recording already there
+        :param chunk_size: number of transitions buffered in memory between writes
+        :param max_shard_bytes: size of a shard (all its columns) above which a new shard is started
+        """
+
+        super().__init__(env)
+        self.path = path
+        self.chunk_size = chunk_size
+        self.max_shard_bytes = max_shard_bytes
+        self.row_bytes = sum(np.dtype(dtype).itemsize * int(np.prod(shape)) for dtype, shape in COLUMNS.values())
+
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta['columns'] != list(COLUMNS) or meta['env'] != env.unwrapped.name:
+                raise ValueError(f'Recording in {path} does not match this environment')
+            self.num_shards = meta['num_shards']
+        else:
+            unwrapped = env.unwrapped
+            meta = {
+                'env': unwrapped.name,
+                'width': unwrapped.width,
+                'height': unwrapped.height,
+                'columns': list(COLUMNS),
+                'num_shards': 1,
+            }
+            with open(meta_path, 'w') as f:
+                json.dump(meta, f)
+            self.num_shards = 1
+
+        # Size of the current (last) shard, which new chunks are appended to
+        self.shard_rows = self.count_rows(self.num_shards - 1)
+
+        # In-memory chunk
+        self.buffers = {name: np.zeros((chunk_size,) + shape, dtype=dtype) for name, (dtype, shape) in COLUMNS.items()}
+        self.num_buffered = 0
+
+        self.last_state = self.last_goal = None
+
+        # Whether the next transition is the first one of an episode
+        self.first = False
+
+    def count_rows(self, shard):
+        name, (dtype, shape) = next(iter(COLUMNS.items()))
+        path = column_path(self.path, shard, name)
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // (np.dtype(dtype).itemsize * int(np.prod(shape)))
+
+    def reset(self, **kwargs):
+        state, goal = self.env.reset(**kwargs)
+        self.last_state, self.last_goal = state, goal
+        self.first = True
+        return state, goal
+
+    def step(self, action):
+        state, reward, done, info = self.env.step(action)
+
+        i = self.num_buffered
+        self.buffers['state'][i] = self.last_state
+        self.buffers['goal'][i] = self.last_goal
+        self.buffers['action'][i] = action
+        self.buffers['reward'][i] = reward
+        self.buffers['next_state'][i] = state
+        self.buffers['done'][i] = done
+        self.buffers['truncated'][i] = info.get('TimeLimit.truncated', False)
+        self.buffers['first'][i] = self.first
+        self.num_buffered += 1
+
+        self.last_state = state
+        self.first = False
+        if self.num_buffered == self.chunk_size:
+            self.flush()
+
+        return state, reward, done, info
+
+    def flush(self):
+        # Append the buffered chunk to the current shard, starting a new shard if it is full
+        if not self.num_buffered:
+            return
+
+        if self.shard_rows and (self.shard_rows + self.num_buffered) * self.row_bytes > self.max_shard_bytes:
+            self.num_shards += 1
+            self.shard_rows = 0
+            meta_path = os.path.join(self.path, META_FILE)
+            with open(meta_path) as f:
+                meta = json.load(f)
+            meta['num_shards'] = self.num_shards
+            with open(meta_path, 'w') as f:
+                json.dump(meta, f)
+
+        for name, buffer in self.buffers.items():
+            with open(column_path(self.path, self.num_shards - 1, name), 'ab') as f:
+                f.write(buffer[:self.num_buffered].tobytes())
+
+        self.shard_rows += self.num_buffered
+        self.num_buffered = 0
+        return
+
+    def close(self):
+        self.flush()
+        return super().close()
+
+
+class TrajectoryReader:
+    """
+    Memory-mapped view over a recording written by TrajectoryRecorder
+    Transitions can be randomly indexed across shards or iterated shard by shard without copying, and whole episodes
+    can be replayed into an environment (e.g. to render them)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+
+        # One dict of memory-mapped columns per non-empty shard
+        self.shards = []
+        for shard in range(self.meta['num_shards']):
+            columns = {}
+            for name in self.meta['columns']:
+                dtype, shape = COLUMNS[name]
+                file = column_path(path, shard, name)
+                size = os.path.getsize(file) if os.path.exists(file) else 0
+                num_rows = size // (np.dtype(dtype).itemsize * int(np.prod(shape)))
+                columns[name] = np.memmap(file, dtype=dtype, mode='r', shape=(num_rows,) + shape) if num_rows else \
+                    np.zeros((0,) + shape, dtype=dtype)
+            # A shard being written may have some columns one chunk ahead of others
+            num_rows = min(len(column) for column in columns.values())
+            if num_rows:
+                self.shards.append({name: column[:num_rows] for name, column in columns.items()})
+
+        # Global index of the first transition of each shard
+        self.offsets = np.cumsum([0] + [len(shard['done']) for shard in self.shards])
+        self.episode_bounds = None
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getitem__(self, i):
+        # Transition i as a dict of column values
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f'Transition {i} out of range')
+        shard = np.searchsorted(self.offsets, i, side='right') - 1
+        return {name: column[i - self.offsets[shard]] for name, column in self.shards[shard].items()}
+
+    def __iter__(self):
+        # Iterate over shards as dicts of memory-mapped columns
+        return iter(self.shards)
+
+    def column(self, name):
+        # Whole column across shards (a view for a single shard, a copy otherwise)
+        if len(self.shards) == 1:
+            return self.shards[0][name]
+        dtype, shape = COLUMNS[name]
+        if not self.shards:
+            return np.zeros((0,) + shape, dtype=dtype)
+        return np.concatenate([shard[name] for shard in self.shards])
+
+    @property
+    def episodes(self):
+        # (E, 2) array of [start, end) transition indices of each episode, any of them may be unfinished
+        if self.episode_bounds is None:
+            if 'first' in self.meta['columns']:
+                starts = np.union1d([0], np.flatnonzero(self.column('first')))
+            else:
+                # Recordings without episode starts: episodes can only be delimited by their ends
+                starts = np.concatenate(([0], np.flatnonzero(self.column('done')) + 1))
+            ends = np.append(starts[1:], len(self))
+            self.episode_bounds = np.column_stack((starts, ends))[starts < ends]
+        return self.episode_bounds
+
+    def replay(self, env, episode):
+        """
+        Replay an episode into env, yielding after the reset and after each step (e.g. to call env.render())
+        The environment must have the same layout as the recorded one, which is checked at every step
+        :return: generator of (state, goal) tuples
+        """
+
+        env = env.unwrapped
+        start, end = self.episodes[episode]
+        first = self[start]
+        state, goal = env.reset_to(first['state'], first['goal'])
+        yield state, goal
+
+        for i in range(start, end):
+            transition = self[i]
+            state, _, _, _ = env.step(int(transition['action']))
+            if not np.array_equal(state, transition['next_state']):
+                raise ValueError(f'Replay diverged from the recording at transition {i}')
+            yield state, goal
+        return
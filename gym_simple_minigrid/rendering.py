@@ -1,5 +1,6 @@
 import math
 import numpy as np
+from functools import lru_cache
 
 
 def downsample(img, factor):
@@ -17,28 +18,42 @@ def downsample(img, factor):
     return img
 
 
+@lru_cache(maxsize=None)
+def pixel_coords(height, width):
+    """
+    Normalized (x, y) coordinates of the pixel centers of an image, as two (height, width) arrays
+    """
+
+    yf = (np.arange(height) + 0.5) / height
+    xf = (np.arange(width) + 0.5) / width
+    x, y = np.meshgrid(xf, yf)
+    x.flags.writeable = False
+    y.flags.writeable = False
+    return x, y
+
+
 def fill_coords(img, fn, color):
     """
     Fill pixels of an image with coordinates matching a filter function
+    The filter function is evaluated once over the coordinates of all pixels and returns a boolean mask
     """
 
-    for y in range(img.shape[0]):
-        for x in range(img.shape[1]):
-            yf = (y + 0.5) / img.shape[0]
-            xf = (x + 0.5) / img.shape[1]
-            if fn(xf, yf):
-                img[y, x] = color
+    x, y = pixel_coords(img.shape[0], img.shape[1])
+    img[fn(x, y)] = color
 
     return img
 
 
 def rotate_fn(fin, cx, cy, theta):
+    cos = math.cos(-theta)
+    sin = math.sin(-theta)
+
     def fout(x, y):
         x = x - cx
         y = y - cy
 
-        x2 = cx + x * math.cos(-theta) - y * math.sin(-theta)
-        y2 = cy + y * math.cos(-theta) + x * math.sin(-theta)
+        x2 = cx + x * cos - y * sin
+        y2 = cy + y * cos + x * sin
 
         return fin(x2, y2)
 
@@ -46,11 +61,9 @@ def rotate_fn(fin, cx, cy, theta):
 
 
 def point_in_line(x0, y0, x1, y1, r):
-    p0 = np.array([x0, y0])
-    p1 = np.array([x1, y1])
-    _dir = p1 - p0
-    dist = np.linalg.norm(_dir)
-    _dir = _dir / dist
+    dist = math.hypot(x1 - x0, y1 - y0)
+    dir_x = (x1 - x0) / dist
+    dir_y = (y1 - y0) / dist
 
     xmin = min(x0, x1) - r
     xmax = max(x0, x1) + r
@@ -58,20 +71,14 @@ def point_in_line(x0, y0, x1, y1, r):
     ymax = max(y0, y1) + r
 
     def fn(x, y):
-        # Fast, early escape test
-        if x < xmin or x > xmax or y < ymin or y > ymax:
-            return False
-
-        q = np.array([x, y])
-        pq = q - p0
-
         # Closest point on line
-        a = np.dot(pq, _dir)
-        a = np.clip(a, 0, dist)
-        p = p0 + a * _dir
+        a = np.clip((x - x0) * dir_x + (y - y0) * dir_y, 0, dist)
+        px = x0 + a * dir_x
+        py = y0 + a * dir_y
 
-        dist_to_line = np.linalg.norm(q - p)
-        return dist_to_line <= r
+        dist_to_line = np.hypot(x - px, y - py)
+        in_box = (xmin <= x) & (x <= xmax) & (ymin <= y) & (y <= ymax)
+        return in_box & (dist_to_line <= r)
 
     return fn
 
@@ -85,35 +92,36 @@ def point_in_circle(cx, cy, r):
 
 def point_in_rect(xmin, xmax, ymin, ymax):
     def fn(x, y):
-        return xmin <= x <= xmax and ymin <= y <= ymax
+        return (xmin <= x) & (x <= xmax) & (ymin <= y) & (y <= ymax)
 
     return fn
 
 
 def point_in_triangle(a, b, c):
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
+    # Edge vectors
+    v0_x, v0_y = c[0] - a[0], c[1] - a[1]
+    v1_x, v1_y = b[0] - a[0], b[1] - a[1]
+
+    # Dot products that do not depend on the point
+    dot00 = v0_x * v0_x + v0_y * v0_y
+    dot01 = v0_x * v1_x + v0_y * v1_y
+    dot11 = v1_x * v1_x + v1_y * v1_y
+    inv_denom = 1 / (dot00 * dot11 - dot01 * dot01)
 
     def fn(x, y):
-        v0 = c - a
-        v1 = b - a
-        v2 = np.array((x, y)) - a
+        v2_x = x - a[0]
+        v2_y = y - a[1]
 
         # Compute dot products
-        dot00 = np.dot(v0, v0)
-        dot01 = np.dot(v0, v1)
-        dot02 = np.dot(v0, v2)
-        dot11 = np.dot(v1, v1)
-        dot12 = np.dot(v1, v2)
+        dot02 = v0_x * v2_x + v0_y * v2_y
+        dot12 = v1_x * v2_x + v1_y * v2_y
 
         # Compute barycentric coordinates
-        inv_denom = 1 / (dot00 * dot11 - dot01 * dot01)
         u = (dot11 * dot02 - dot01 * dot12) * inv_denom
         v = (dot00 * dot12 - dot01 * dot02) * inv_denom
 
         # Check if point is in triangle
-        return (u >= 0) and (v >= 0) and (u + v) < 1
+        return (u >= 0) & (v >= 0) & ((u + v) < 1)
 
     return fn
 
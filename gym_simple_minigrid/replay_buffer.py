@@ -0,0 +1,131 @@
+import numpy as np
+from gym.utils import seeding
+
+# Hindsight relabeling strategies: which achieved goal replaces the goal of a sampled transition
+#   future: goal achieved at a random later (or the same) step of the same episode
+#   final: goal achieved at the end of the episode
+#   episode: goal achieved at a random step of the same episode
+STRATEGIES = ('future', 'final', 'episode')
+
+
+class HindsightReplayBuffer:
+    """
+    Ring buffer of goal-conditioned transitions with vectorized hindsight experience replay (HER)
+    Episodes are stored in preallocated arrays together with the goal achieved by each transition (computed in bulk with
+    state_goal_mapper when the episode is added). Sampling draws transitions uniformly, relabels a fraction of their goals
+    with goals achieved later in their episode and recomputes rewards with the -1/0 reward rule of the environments, all
+    with array operations
+    """
+
+    def __init__(self, capacity, state_goal_mapper, strategy='future', relabel_prob=0.8, seed=None):
+        """
+        :param capacity: maximum number of transitions, the oldest ones are overwritten first
+        :param state_goal_mapper: function mapping an (..., 3) array of states to their (..., 2) achieved goals,
+            usually env.state_goal_mapper
+        :param strategy: relabeling strategy, one of STRATEGIES
+        :param relabel_prob: probability of relabeling the goal of a sampled transition
+        :param seed: seed for the sampling random number generator
+        """
+
+        assert strategy in STRATEGIES, f'Unknown strategy {strategy}, expected one of {STRATEGIES}'
+
+        self.capacity = capacity
+        self.state_goal_mapper = state_goal_mapper
+        self.strategy = strategy
+        self.relabel_prob = relabel_prob
+
+        self.np_random = None
+        self.seed(seed=seed)
+
+        # Transitions
+        self.states = np.zeros((capacity, 3), dtype=np.int16)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.next_states = np.zeros((capacity, 3), dtype=np.int16)
+        self.goals = np.zeros((capacity, 2), dtype=np.int16)
+        self.achieved_goals = np.zeros((capacity, 2), dtype=np.int16)
+
+        # Absolute indices [start, end) of the episode of each transition. Transition t is stored at t % capacity
+        self.episode_start = np.zeros(capacity, dtype=np.int64)
+        self.episode_end = np.zeros(capacity, dtype=np.int64)
+
+        # Number of transitions added so far
+        self.total = 0
+
+    def seed(self, seed=None):
+        # Seed the random number generator
+        self.np_random, _ = seeding.np_random(seed)
+        return [seed]
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def add_episode(self, states, actions, goal):
+        """
+        :param states: (T + 1, 3) states visited by the episode, from the initial one to the last one
+        :param actions: (T,) actions taken
+        :param goal: (2,) goal of the episode
+        """
+
+        states = np.asarray(states)
+        num_steps = len(actions)
+        if len(states) != num_steps + 1:
+            raise ValueError(f'Expected {num_steps + 1} states for {num_steps} actions, got {len(states)}')
+        if num_steps > self.capacity:
+            raise ValueError(f'Episode of {num_steps} steps does not fit in a buffer of capacity {self.capacity}')
+
+        idx = np.arange(self.total, self.total + num_steps) % self.capacity
+        self.states[idx] = states[:-1]
+        self.actions[idx] = actions
+        self.next_states[idx] = states[1:]
+        self.goals[idx] = goal
+        self.achieved_goals[idx] = self.state_goal_mapper(states[1:])
+        self.episode_start[idx] = self.total
+        self.episode_end[idx] = self.total + num_steps
+
+        self.total += num_steps
+        return
+
+    def sample(self, batch_size):
+        """
+        Sample a batch of transitions with hindsight relabeling
+        Rewards are 0 for transitions achieving their (possibly relabeled) goal and -1 otherwise, and such transitions
+        are terminal
+        :return: dict of states (B, 3), actions (B,), rewards (B,), next_states (B, 3), goals (B, 2) and dones (B,)
+        """
+
+        if not self.total:
+            raise ValueError('Cannot sample from an empty buffer')
+
+        # Absolute indices of the sampled transitions (among the ones still stored)
+        oldest = self.total - len(self)
+        t = self.np_random.integers(oldest, self.total, size=batch_size)
+        idx = t % self.capacity
+
+        # Pick the transitions whose goal gets relabeled and the step of their episode whose achieved goal is used
+        relabel = self.np_random.random(batch_size) < self.relabel_prob
+        end = self.episode_end[idx]
+        if self.strategy == 'future':
+            low = t
+        elif self.strategy == 'final':
+            low = end - 1
+        else:
+            # The beginning of the episode may have been overwritten already
+            low = np.maximum(self.episode_start[idx], oldest)
+        # low + floor(u * (end - low)) is uniform over [low, end)
+        relabel_t = low + (self.np_random.random(batch_size) * (end - low)).astype(np.int64)
+
+        goals = self.goals[idx]
+        goals[relabel] = self.achieved_goals[relabel_t[relabel] % self.capacity]
+
+        # Recompute rewards for the new goals
+        dones = (self.achieved_goals[idx] == goals).all(axis=1)
+        rewards = np.where(dones, 0, -1)
+
+        return {
+            'states': self.states[idx],
+            'actions': self.actions[idx],
+            'rewards': rewards,
+            'next_states': self.next_states[idx],
+            'goals': goals,
+            'dones': dones,
+        }
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import numpy as np
+from .cache import cache_dir, save_array
+
+# Default directory where solved tables are cached (overridden by $SIMPLE_MINIGRID_CACHE_DIR)
+DEFAULT_CACHE_DIR = os.path.join('~', '.cache', 'gym_simple_minigrid')
+
+# Q-value of actions from which the goal cannot be reached
+UNREACHABLE = np.iinfo(np.int16).min
+
+
+def layout_hash(env):
+    # Identify the layout (and goal definition, which is given by the env class) of an environment
+    layout = env.unwrapped.layout
+    digest = hashlib.sha1(layout.grid.array.tobytes())
+    digest.update(str(layout.grid.array.shape).encode())
+    digest.update(env.unwrapped.__class__.__qualname__.encode())
+    return digest.hexdigest()[:16]
+
+
+def q_table(env, use_cache=True):
+    """
+    Exact goal-conditioned Q*(goal, state, action) of an environment, for every goal at once
+    With a reward of -1 per step, 0 on the step reaching the goal and termination there, Q*(s, g, a) = -d(s', g) where s'
+    is the next state and d the minimal number of actions from s' to g. Distances come from the backward breadth-first
+    search over all goals of the layout (see oracle.py), so no value iteration sweeps are needed
+    :param env: environment with a static layout
+    :param use_cache: load the table from (and save it to) the on-disk cache
+    :return: (goals, width, height, 4, 3) int16 table, indexed as [goal, x, y, dir, action] where goal is the index
+        of the goal cell in env.layout.free_cells. Unreachable goals are UNREACHABLE
+    """
+
+    env = env.unwrapped
+    path = None
+    if use_cache:
+        path = os.path.join(cache_dir(DEFAULT_CACHE_DIR), f'q_table_{env.name}_{layout_hash(env)}.npy')
+        if os.path.exists(path):
+            return np.load(path, mmap_mode='r')
+
+    distances = env.layout.goal_distances(env.state_goal_mapper)
+    next_state = env.layout.next_state
+    q = -distances[:, next_state[..., 0], next_state[..., 1], next_state[..., 2]]
+    q[q > 0] = UNREACHABLE
+
+    if path is not None:
+        save_array(path, q)
+    return q
+
+
+def state_values(env):
+    """
+    Optimal values V*(goal, state) = max_a Q*(goal, state, action), as a (goals, width, height, 4) int16 table
+    Values of states that already achieve the goal are 0
+    """
+
+    env = env.unwrapped
+    distances = env.layout.goal_distances(env.state_goal_mapper)
+    values = np.where(distances > 0, 1 - distances, 0).astype(np.int16)
+    values[distances < 0] = UNREACHABLE
+    return values
+
+
+def evaluate_policy(env, policy, max_steps=None):
+    """
+    Exact returns of a deterministic tabular policy, from every (goal, initial state) pair at once
+    All pairs are rolled out in lockstep on the layout transition table until the goal is reached or max_steps is hit
+    :param policy: (goals, width, height, 4) array of actions, indexed as q_table
+    :param max_steps: episode time limit (env.max_steps by default)
+    :return: (goals, width, height, 4) int array of returns
+    """
+
+    env = env.unwrapped
+    layout = env.layout
+    if max_steps is None:
+        max_steps = env.max_steps
+
+    # Work with flat state indices: s = (x * height + y) * 4 + dir
+    num_goals, width, height, num_dirs = policy.shape
+    num_states = width * height * num_dirs
+    next_state = layout.next_state
+    num_actions = next_state.shape[3]
+    flat_next = ((next_state[..., 0] * height + next_state[..., 1]) * num_dirs + next_state[..., 2]).ravel()
+    states = np.stack(np.meshgrid(np.arange(width), np.arange(height), np.arange(num_dirs), indexing='ij'), axis=-1)
+    achieved = env.state_goal_mapper(states.reshape(-1, 3))
+    achieved_goal = layout.cell_index[achieved[:, 0], achieved[:, 1]]
+    walkable = np.repeat(layout.cell_index.ravel() >= 0, num_dirs)
+    flat_policy = np.asarray(policy).reshape(num_goals, num_states)
+
+    # Roll out from walkable states that do not achieve the goal yet, keeping only the active pairs
+    goal, state = np.divmod(np.arange(num_goals * num_states), num_states)
+    active = walkable[state] & (achieved_goal[state] != goal)
+    pairs, goal, state = np.flatnonzero(active), goal[active], state[active]
+
+    returns = np.zeros(num_goals * num_states, dtype=np.int64)
+    for _ in range(max_steps):
+        if not len(pairs):
+            break
+        state = flat_next[state * num_actions + flat_policy[goal, state]]
+        reached = achieved_goal[state] == goal
+        returns[pairs[~reached]] -= 1
+        pairs, goal, state = pairs[~reached], goal[~reached], state[~reached]
+
+    return returns.reshape(num_goals, width, height, num_dirs)
+
+
+def optimality_gap(env, policy, max_steps=None):
+    """
+    Mean difference between optimal and policy returns, over every (goal, initial state) pair an episode could start
+    from (free cells not achieving the goal)
+    :param policy: (goals, width, height, 4) array of actions, e.g. q.argmax(axis=-1) for a learned Q-table q
+    """
+
+    env = env.unwrapped
+    distances = env.layout.goal_distances(env.state_goal_mapper)
+    valid = distances > 0
+    returns = evaluate_policy(env, policy, max_steps)
+    return np.mean(state_values(env)[valid] - returns[valid])
@@ -0,0 +1,150 @@
+import gym
+import numpy as np
+from gym import spaces
+from gym.utils import seeding
+from . import profiling
+from .batch_rendering import BatchRenderer
+from .minigrid import LARGE_GRID_VIEWPORT, SimpleMiniGridEnv
+from .views import egocentric_views
+
+
+class SimpleMiniGridVecEnv:
+    """
+    Batch of independent copies of a Simple-MiniGrid environment with a static layout (e.g. Empty, FourRooms)
+    Agent positions, directions, goals and step counts are kept as (N,) arrays and all copies are stepped at once
+    """
+
+    def __init__(self, env, num_envs, seed=9):
+        """
+        :param env: registered env id or SimpleMiniGridEnv instance used as template for the layout
+        :param num_envs: number of environment copies N
+        :param seed: seed for the shared random number generator
+        """
+
+        if isinstance(env, str):
+            env = gym.make(env)
+        env = env.unwrapped
+
+        self.name = env.name
+        self.num_envs = num_envs
+
+        # Environment configuration, shared by all copies
+        self.width = env.width
+        self.height = env.height
+        self.max_steps = env.max_steps
+        self.actions = SimpleMiniGridEnv.Actions
+        self.single_action_space = env.action_space
+        self.single_observation_space = env.observation_space
+        self.action_space = spaces.MultiDiscrete([len(self.actions)] * num_envs)
+
+        # Static layout and its transition table, indexed as [x, y, dir, action] (None for large grids)
+        self.layout = env.layout
+        self.next_state = None if self.layout.large else self.layout.next_state
+
+        # Initialize the RNG
+        self.np_random = None
+        self.seed(seed=seed)
+
+        # Batched environment state
+        self.agent_pos = np.zeros((num_envs, 2), dtype=np.int64)
+        self.agent_dir = np.zeros(num_envs, dtype=np.int64)
+        self.goal_pos = np.zeros((num_envs, 2), dtype=np.int64)
+        self.step_count = np.zeros(num_envs, dtype=np.int64)
+
+        # States reached by the last step, before finished episodes were reset
+        self.final_states = None
+
+        # Renderer for rgb_array frames of all copies, created on first render
+        self.renderer = None
+        self.reset()
+
+    def seed(self, seed=None):
+        # Seed the random number generator
+        self.np_random, _ = seeding.np_random(seed)
+        return [seed]
+
+    @property
+    def state(self):
+        return np.column_stack((self.agent_pos, self.agent_dir))
+
+    def reset(self):
+        self.reset_envs(np.arange(self.num_envs))
+        self.final_states = self.state
+        return self.state, self.goal_pos.copy()
+
+    def reset_envs(self, env_ids):
+        # Sample a random initial state and a different random goal for each env in env_ids
+        agent_pos, agent_dir, goal_pos = self.layout.sample_state_goal(self.np_random, size=len(env_ids))
+        self.agent_pos[env_ids] = agent_pos
+        self.agent_dir[env_ids] = agent_dir
+        self.goal_pos[env_ids] = goal_pos
+        self.step_count[env_ids] = 0
+        return
+
+    def step(self, actions, env_ids=None):
+        """
+        Step all environments with an (N,) array of actions, or only the (unique) envs in env_ids with one action each
+        Finished episodes are reset in place: their returned state and goal (self.goal_pos) already belong to the new
+        episode, while the state in which they finished is kept in self.final_states
+        :return: states (N, 3), rewards (N,), dones (N,), truncated (N,) of the stepped envs
+        """
+
+        ids = slice(None) if env_ids is None else np.asarray(env_ids)
+        num_envs = self.num_envs if env_ids is None else len(ids)
+
+        actions = np.asarray(actions)
+        if actions.shape != (num_envs,):
+            raise ValueError(f'Expected {num_envs} actions, got shape {actions.shape}')
+        if ((actions < 0) | (actions >= len(self.actions))).any():
+            raise ValueError('Action out of bounds')
+
+        self.step_count[ids] += 1
+
+        agent_pos = self.agent_pos[ids]
+        if self.next_state is None:
+            next_state = self.layout.transition(agent_pos[:, 0], agent_pos[:, 1], self.agent_dir[ids], actions)
+        else:
+            next_state = self.next_state[agent_pos[:, 0], agent_pos[:, 1], self.agent_dir[ids], actions]
+        self.agent_pos[ids] = next_state[:, :2]
+        self.agent_dir[ids] = next_state[:, 2]
+
+        truncated = self.step_count[ids] >= self.max_steps
+        reached = (next_state[:, :2] == self.goal_pos[ids]).all(axis=1)
+        dones = truncated | reached
+        rewards = np.where(reached, 0, -1)
+
+        self.final_states[ids] = next_state
+        if dones.any():
+            self.reset_envs(np.arange(self.num_envs)[ids][dones])
+
+        return self.state[ids], rewards, dones, truncated
+
+    def egocentric_views(self, view_size=7):
+        """
+        Agent-centered, direction-rotated (N, view_size, view_size) cell types of all environments
+        See wrappers.EgocentricView for single environments
+        """
+
+        padded_types = self.layout.padded_types(view_size - 1)
+        return egocentric_views(padded_types, self.agent_pos, self.agent_dir, view_size, goals=self.goal_pos[:, None])
+
+    def render(self, tile_size=32, out=None, viewport=None):
+        """
+        Render all environments as an (N, H, W, 3) uint8 array, optionally into a preallocated output buffer
+        :param viewport: optional viewport of every environment (see BatchRenderer.render). Large grids use
+            LARGE_GRID_VIEWPORT by default
+        """
+
+        if self.renderer is None or self.renderer.tile_size != tile_size:
+            self.renderer = BatchRenderer(tile_size)
+        if viewport is None and self.layout.large:
+            viewport = LARGE_GRID_VIEWPORT
+        return self.renderer.render(self.layout.grid.array, self.agent_pos, self.agent_dir, self.goal_pos[:, None],
+                                    out=out, viewport=viewport)
+
+    def perf_stats(self):
+        # Snapshot of the instrumentation stats of this batch of environments (see profiling.py)
+        return profiling.perf_stats(self)
+
+    def close(self):
+        return
@@ -0,0 +1,319 @@
+import struct
+import gym
+import numpy as np
+from .batch_rendering import BatchRenderer
+from .minigrid import LARGE_GRID_VIEWPORT, TileAtlas
+
+# LZW codes of 8-bit GIF images: clear and end-of-information, followed by dictionary entries
+GIF_CLEAR, GIF_END = 256, 257
+
+# Pixels written between two clear codes, so that the decoder dictionary never grows past 9-bit codes
+GIF_CLEAR_INTERVAL = 252
+
+
+def atlas_palette(tile_size=32, subdivs=3):
+    """
+    Every color that can appear in rendered frames of a tile size (frames are made of tile atlas tiles)
+    :return: (P, 3) uint8 array, P <= 256
+    """
+
+    tiles = TileAtlas.get(tile_size, subdivs).warm().tiles
+    palette = np.unique(tiles.reshape(-1, 3), axis=0)
+    assert len(palette) <= 256, 'Tile colors do not fit in a GIF palette'
+    return palette
+
+
+def color_keys(colors):
+    # Pack RGB colors into single integers
+    colors = colors.astype(np.uint32)
+    return (colors[..., 0] << 16) | (colors[..., 1] << 8) | colors[..., 2]
+
+
+class GifWriter:
+    """
+    Streaming animated GIF writer for frames made of a fixed palette of colors
+    Consecutive identical frames are merged into a single longer frame, and only the bounding box of the pixels that
+    changed since the previous frame is written. Memory use is bounded by two frames whatever the video length
+    Pixels are written as literal 9-bit LZW codes (no compression), which can be done with array operations only
+    """
+
+    def __init__(self, path, palette, fps=10):
+        """
+        :param path: output .gif file
+        :param palette: (P, 3) uint8 colors of the frames, P <= 256 (see atlas_palette)
+        :param fps: frames per second
+        """
+
+        palette = np.asarray(palette, dtype=np.uint8)
+        order = np.argsort(color_keys(palette))
+        self.palette = palette[order]
+        self.palette_keys = color_keys(self.palette)
+        self.delay = max(1, round(100 / fps))
+
+        self.file = open(path, 'wb')
+        self.shape = None
+
+        # Last frame (as palette indices) and the frame waiting for its duration to be known
+        self.last = None
+        self.pending = None
+        self.pending_count = 0
+
+    def indices(self, frame):
+        # Palette index of every pixel of an (H, W, 3) frame
+        keys = color_keys(frame)
+        idx = np.minimum(np.searchsorted(self.palette_keys, keys), len(self.palette_keys) - 1)
+        if (self.palette_keys[idx] != keys).any():
+            raise ValueError('Frame has colors outside of the palette')
+        return idx.astype(np.uint8)
+
+    def write_header(self, height, width):
+        color_table = np.zeros((256, 3), dtype=np.uint8)
+        color_table[:len(self.palette)] = self.palette
+        self.file.write(b'GIF89a' + struct.pack('<HHBBB', width, height, 0xF7, 0, 0) + color_table.tobytes())
+        # Loop forever
+        self.file.write(b'\x21\xFF\x0BNETSCAPE2.0\x03\x01' + struct.pack('<H', 0) + b'\x00')
+        return
+
+    def write(self, frame):
+        frame = np.asarray(frame)
+        if self.shape is None:
+            self.shape = frame.shape
+            self.write_header(*frame.shape[:2])
+        assert frame.shape == self.shape, 'All frames must have the same shape'
+
+        idx = self.indices(frame)
+        if self.last is None:
+            box = (0, 0, frame.shape[1], frame.shape[0])
+        else:
+            changed = idx != self.last
+            if not changed.any():
+                # Identical frame: show the pending one longer
+                self.pending_count += 1
+                return
+            rows, cols = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+            box = (cols[0], rows[0], cols[-1] + 1, rows[-1] + 1)
+
+        self.flush()
+        self.pending = (box, idx[box[1]:box[3], box[0]:box[2]])
+        self.pending_count = 1
+        self.last = idx
+        return
+
+    def flush(self):
+        # Write the pending frame, now that its duration is known
+        if self.pending is None:
+            return
+        (x0, y0, x1, y1), idx = self.pending
+        delay = min(self.delay * self.pending_count, 0xFFFF)
+
+        # Graphic control extension (keep previous frame below, delay) and image descriptor
+        self.file.write(b'\x21\xF9\x04\x04' + struct.pack('<HBB', delay, 0, 0))
+        self.file.write(b'\x2C' + struct.pack('<HHHHB', x0, y0, x1 - x0, y1 - y0, 0))
+
+        # One literal code per pixel, with a clear code every GIF_CLEAR_INTERVAL pixels
+        pixels = idx.ravel().astype(np.uint16)
+        codes = np.insert(pixels, np.arange(0, len(pixels), GIF_CLEAR_INTERVAL), GIF_CLEAR)
+        codes = np.append(codes, GIF_END)
+        bits = ((codes[:, None] >> np.arange(9, dtype=np.uint16)) & 1).astype(np.uint8)
+        data = np.packbits(bits.ravel(), bitorder='little').tobytes()
+
+        # LZW minimum code size, then data in sub-blocks of at most 255 bytes
+        blocks = [bytes((len(data[i:i + 255]),)) + data[i:i + 255] for i in range(0, len(data), 255)]
+        self.file.write(b'\x08' + b''.join(blocks) + b'\x00')
+
+        self.pending = None
+        return
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.write(b'\x3B')
+        self.file.close()
+        return
+
+
+def counts_path(path):
+    # File with the number of times each frame of a raw frame file was shown
+    return (path[:-len('.npy')] if path.endswith('.npy') else path) + '.counts.npy'
+
+
+def load_frames(path, mmap_mode='r'):
+    """
+    Frames written by RawFrameWriter, with consecutive identical frames stored once
+    :return: (N, H, W, 3) uint8 frames (memory-mapped by default) and (N,) number of times each one was shown
+    """
+
+    return np.load(path, mmap_mode=mmap_mode), np.load(counts_path(path))
+
+
+class RawFrameWriter:
+    """
+    Streaming writer of raw frames into a (N, H, W, 3) uint8 .npy file, which can be memory-mapped back
+    Consecutive identical frames are stored once: the number of times each stored frame was shown is saved next to it,
+    in a '.counts.npy' file
+    """
+
+    # Room reserved for the .npy header, which is rewritten with the final number of frames on close
+    header_size = 128
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(b'\0' * self.header_size)
+        self.shape = None
+        self.last = None
+        self.counts = []
+
+    def write(self, frame):
+        frame = np.asarray(frame, dtype=np.uint8)
+        if self.shape is None:
+            self.shape = frame.shape
+        assert frame.shape == self.shape, 'All frames must have the same shape'
+
+        if self.last is not None and np.array_equal(frame, self.last):
+            self.counts[-1] += 1
+            return
+        self.file.write(np.ascontiguousarray(frame).tobytes())
+        self.last = frame.copy()
+        self.counts.append(1)
+        return
+
+    def close(self):
+        if self.file.closed:
+            return
+        shape = (len(self.counts),) + (self.shape or (0, 0, 3))
+        header = repr({'descr': '|u1', 'fortran_order': False, 'shape': shape}).encode('latin1')
+        header = header.ljust(self.header_size - 10 - 1) + b'\n'
+        self.file.seek(0)
+        self.file.write(b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header)
+        self.file.close()
+        np.save(counts_path(self.path), np.array(self.counts, dtype=np.int64))
+        return
+
+
+def open_writer(path, tile_size, fps):
+    # GIF writer for .gif paths, raw frame writer otherwise
+    if path.endswith('.gif'):
+        return GifWriter(path, atlas_palette(tile_size), fps)
+    return RawFrameWriter(path)
+
+
+class VideoRecorder(gym.Wrapper):
+    """
+    Headless recorder of every episode of an environment: frames of the rgb_array render path are streamed into a
+    file per episode (animated GIF for .gif paths, raw .npy frames otherwise) while the episode runs
+    """
+
+    def __init__(self, env, path, tile_size=16, fps=10, viewport=None):
+        """
+        :param env: Simple-MiniGrid environment
+        :param path: output path pattern formatted with the episode number, e.g. 'videos/episode_{episode}.gif'
+        :param tile_size: tile size of the recorded frames
+        :param fps: frames per second of GIF files
+        :param viewport: optional viewport rendered instead of the whole grid (see SimpleMiniGridEnv.render)
+        """
+
+        super().__init__(env)
+        self.path = path
+        self.tile_size = tile_size
+        self.fps = fps
+        self.viewport = viewport
+        self.episode = 0
+        self.writer = None
+
+    def record(self):
+        self.writer.write(self.env.unwrapped.render('rgb_array', tile_size=self.tile_size, viewport=self.viewport))
+        return
+
+    def reset(self, **kwargs):
+        if self.writer is not None:
+            self.writer.close()
+            self.episode += 1
+        observation = self.env.reset(**kwargs)
+        self.writer = open_writer(self.path.format(episode=self.episode), self.tile_size, self.fps)
+        self.record()
+        return observation
+
+    def step(self, action):
+        observation, reward, done, info = self.env.step(action)
+        self.record()
+        if done:
+            self.writer.close()
+        return observation, reward, done, info
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        return super().close()
+
+
+class BatchVideoRecorder:
+    """
+    Headless recorder of every episode of all the environments of a SimpleMiniGridVecEnv, e.g. for evaluation sweeps
+    Frames of all environments are rendered at once with a BatchRenderer and streamed into one file per episode
+    """
+
+    def __init__(self, envs, path, tile_size=16, fps=10, viewport=None):
+        """
+        :param envs: SimpleMiniGridVecEnv
+        :param path: output path pattern formatted with the env and episode numbers, e.g. 'videos/{env}_{episode}.gif'
+        :param viewport: optional viewport of the recorded frames (see BatchRenderer.render). Large grids use
+            LARGE_GRID_VIEWPORT by default
+        """
+
+        self.envs = envs
+        self.path = path
+        self.tile_size = tile_size
+        self.fps = fps
+        self.viewport = LARGE_GRID_VIEWPORT if viewport is None and envs.layout.large else viewport
+        self.renderer = BatchRenderer(tile_size)
+
+        # Reusable buffer for the frames of all environments
+        self.frames = None
+        self.episodes = np.zeros(envs.num_envs, dtype=np.int64)
+        self.writers = [None] * envs.num_envs
+
+    def render(self, states, goals, out=None):
+        layout = self.envs.layout.grid.array
+        return self.renderer.render(layout, states[:, :2], states[:, 2], goals[:, None], out=out,
+                                    viewport=self.viewport)
+
+    def open(self, env_ids):
+        # Start the files of the current episodes of env_ids, with their first frame
+        frames = self.render(self.envs.state[env_ids], self.envs.goal_pos[env_ids])
+        for env_id, frame in zip(env_ids, frames):
+            path = self.path.format(env=env_id, episode=self.episodes[env_id])
+            self.writers[env_id] = open_writer(path, self.tile_size, self.fps)
+            self.writers[env_id].write(frame)
+        return
+
+    def reset(self):
+        self.close()
+        observation = self.envs.reset()
+        self.open(np.arange(self.envs.num_envs))
+        return observation
+
+    def step(self, actions):
+        goals = self.envs.goal_pos.copy()
+        states, rewards, dones, truncated = self.envs.step(actions)
+
+        # Frames of the states reached by this step, before finished episodes were reset
+        self.frames = self.render(self.envs.final_states, goals, out=self.frames)
+        for env_id, frame in enumerate(self.frames):
+            self.writers[env_id].write(frame)
+
+        finished = np.flatnonzero(dones)
+        for env_id in finished:
+            self.writers[env_id].close()
+            self.episodes[env_id] += 1
+        if len(finished):
+            self.open(finished)
+
+        return states, rewards, dones, truncated
+
+    def close(self):
+        for writer in self.writers:
+            if writer is not None:
+                writer.close()
+        return
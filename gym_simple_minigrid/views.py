@@ -0,0 +1,57 @@
+from functools import lru_cache
+import numpy as np
+from .minigrid import DIR_VEC, OBJECT_TO_IDX
+
+
+@lru_cache(maxsize=None)
+def view_offsets(view_size):
+    """
+    Rotation index of egocentric views: (dx, dy) offset from the agent of every view cell, for each agent direction
+    Views are (view_size, view_size) arrays where the agent looks up from the middle of the bottom row: row 0 is the
+    farthest ahead and columns go from the left to the right of the agent
+    :return: (4, view_size, view_size, 2) int array indexed as [dir, row, col]
+    """
+
+    rows, cols = np.meshgrid(np.arange(view_size), np.arange(view_size), indexing='ij')
+    ahead = view_size - 1 - rows
+    side = cols - view_size // 2
+
+    forward = DIR_VEC[:, None, None, :]
+    # Right of the agent: forward vector rotated 90 degrees clockwise (y axis points down)
+    right = np.stack((-DIR_VEC[:, 1], DIR_VEC[:, 0]), axis=-1)[:, None, None, :]
+    offsets = ahead[..., None] * forward + side[..., None] * right
+    offsets.flags.writeable = False
+    return offsets
+
+
+def egocentric_views(padded_types, agent_pos, agent_dir, view_size, goals=None, num_goals=None):
+    """
+    Agent-centered, direction-rotated (view_size, view_size) windows of cell types (see OBJECT_TO_IDX), for a batch of
+    agents at once. Cells are gathered from the padded layout with the precomputed rotation index (see view_offsets)
+    :param padded_types: cell types of the layout (grid coordinates) padded with view_size - 1 walls on every side,
+        as returned by Layout.padded_types
+    :param agent_pos: (N, 2) agent positions in state coordinates
+    :param agent_dir: (N,) agent directions
+    :param goals: optional (N, G, 2) goals in state coordinates, shown as goal cells in the views
+    :param num_goals: optional (N,) number of goals of each agent (by default all G goals)
+    :return: (N, view_size, view_size) uint8 array
+    """
+
+    agent_pos = np.asarray(agent_pos)
+    offsets = view_offsets(view_size)[np.asarray(agent_dir)]
+
+    # Cells seen by each agent in state coordinates
+    cells = agent_pos[:, None, None, :] + offsets
+
+    # Padded coordinates are shifted by the outer wall (1) and the padding (view_size - 1)
+    shift = view_size
+    views = padded_types[cells[..., 0] + shift, cells[..., 1] + shift]
+
+    if goals is not None:
+        goals = np.asarray(goals)
+        seen = (cells[:, :, :, None, :] == goals[:, None, None, :, :]).all(axis=-1)
+        if num_goals is not None:
+            seen &= np.arange(goals.shape[1]) < np.asarray(num_goals)[:, None, None, None]
+        views[seen.any(axis=-1)] = OBJECT_TO_IDX['goal']
+
+    return views
@@ -1,3 +1,5 @@
+import multiprocessing as mp
+import queue
 import sys
 
 # Only ask users to install matplotlib if they actually need it
@@ -12,6 +14,7 @@ except ModuleNotFoundError:
 class Window:
     """
     Window to draw a gridworld instance using Matplotlib
+    Frames are blitted: only the image and caption are redrawn on top of a saved background, instead of the whole figure
     """
 
     def __init__(self, title):
@@ -23,7 +26,7 @@ class Window:
         self.fig, self.ax = plt.subplots()
 
         # Show the env name in the window title
-        self.fig.canvas.set_window_title(title)
+        self.fig.canvas.manager.set_window_title(title)
 
         # Turn off x/y axis numbering/ticks
         self.ax.xaxis.set_ticks_position('none')
@@ -31,6 +34,13 @@ class Window:
         _ = self.ax.set_xticklabels([])
         _ = self.ax.set_yticklabels([])
 
+        # Caption below the image, redrawn with the image on every frame
+        self.caption = self.ax.text(0.5, -0.02, '', transform=self.ax.transAxes, ha='center', va='top', animated=True)
+
+        # Figure without the animated artists (image and caption), restored before drawing each frame
+        self.background = None
+        self.fig.canvas.mpl_connect('draw_event', self.on_draw)
+
         # Flag indicating the window was closed
         self.closed = False
 
@@ -39,33 +49,57 @@ class Window:
 
         self.fig.canvas.mpl_connect('close_event', close_handler)
 
-    def show_img(self, img):
+    def on_draw(self, _):
+        # Full redraws (first frame, resizes, ...) invalidate the saved background
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_artists()
+
+    def draw_artists(self):
+        if self.imshow_obj is not None:
+            self.ax.draw_artist(self.imshow_obj)
+        self.ax.draw_artist(self.caption)
+
+    def blit(self):
         """
-        Show an image or update the image being shown
+        Redraw the image and caption only, on top of the saved background, instead of the whole figure
         """
 
-        # Show the first image of the environment
-        if self.imshow_obj is None:
-            self.imshow_obj = self.ax.imshow(img, interpolation='bilinear')
+        canvas = self.fig.canvas
+        if self.background is None:
+            canvas.draw()
+        else:
+            canvas.restore_region(self.background)
+            self.draw_artists()
+        canvas.blit(self.fig.bbox)
 
-        self.imshow_obj.set_data(img)
-        self.fig.canvas.draw()
+        # Let matplotlib process UI events, without the fixed sleep of plt.pause
+        canvas.flush_events()
 
-        # Let matplotlib process UI events
-        # This is needed for interactive mode to work properly
-        plt.pause(0.001)
+    def show_img(self, img, caption=None):
+        """
+        Show an image or update the image being shown, optionally with a new caption
+        """
 
-    @staticmethod
-    def set_caption(text):
+        if caption is not None:
+            self.caption.set_text(caption)
+
+        # Show the first image of the environment (or a differently sized one) with a full redraw
+        if self.imshow_obj is None or self.imshow_obj.get_array().shape != img.shape:
+            if self.imshow_obj is not None:
+                self.imshow_obj.remove()
+            self.imshow_obj = self.ax.imshow(img, interpolation='bilinear', animated=True)
+            self.background = None
+        else:
+            self.imshow_obj.set_data(img)
+        self.blit()
+
+    def set_caption(self, text):
         """
         Set/update the caption text below the image
         """
 
-        plt.xlabel(text)
-
-        # Let matplotlib process UI events
-        # This is needed for interactive mode to work properly
-        plt.pause(0.001)
+        self.caption.set_text(text)
+        self.blit()
 
     def reg_key_handler(self, key_handler):
         """
@@ -97,3 +131,98 @@ class Window:
 
         plt.close()
         self.closed = True
+
+
+def viewer_process(title, frames, closed):
+    # Show the frames of the queue in a window until None is received or the window is closed
+    window = Window(title)
+    window.show(block=False)
+    while not window.closed:
+        try:
+            frame = frames.get(timeout=0.05)
+        except queue.Empty:
+            window.fig.canvas.flush_events()
+            continue
+        if frame is None:
+            break
+        window.show_img(*frame)
+    window.close()
+    closed.set()
+
+
+class AsyncWindow:
+    """
+    Window drawn by a separate viewer process, so that the environment loop never blocks on the GUI
+    Frames are sent through a bounded queue: when the viewer falls behind, the oldest queued frames are dropped and only
+    the latest ones are shown
+    """
+
+    def __init__(self, title, queue_size=2, context=None):
+        """
+        :param title: window title
+        :param queue_size: maximum number of frames waiting to be shown
+        :param context: multiprocessing context or start method name (platform default if None)
+        """
+
+        ctx = mp.get_context(context)
+        self.frames = ctx.Queue(queue_size)
+        self.closed_event = ctx.Event()
+        self.process = ctx.Process(target=viewer_process, args=(title, self.frames, self.closed_event), daemon=True)
+        self.process.start()
+
+        # Caption sent with the next frame, and number of frames dropped so far
+        self.caption = None
+        self.dropped = 0
+
+    @property
+    def closed(self):
+        return self.closed_event.is_set()
+
+    def show_img(self, img, caption=None):
+        """
+        Queue an image (and caption) to be shown, without waiting for the viewer
+        """
+
+        if caption is not None:
+            self.caption = caption
+        if self.closed:
+            return
+
+        frame = (img, self.caption)
+        try:
+            self.frames.put_nowait(frame)
+        except queue.Full:
+            # Replace the oldest (stale) frame with the new one
+            try:
+                self.frames.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                self.frames.put_nowait(frame)
+            except queue.Full:
+                self.dropped += 1
+
+    def set_caption(self, text):
+        # Shown with the next image
+        self.caption = text
+
+    @staticmethod
+    def show(block=True):
+        # The viewer process shows the window by itself
+        return
+
+    def close(self):
+        """
+        Close the window and stop the viewer process
+        """
+
+        if self.process.is_alive():
+            try:
+                self.frames.put(None, timeout=1)
+            except queue.Full:
+                pass
+            self.process.join(timeout=1)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.closed_event.set()
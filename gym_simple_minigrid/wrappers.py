@@ -0,0 +1,187 @@
+import gym
+import numpy as np
+from gym import spaces
+from .minigrid import OBJECT_TO_IDX
+from .views import egocentric_views
+
+
+class EgocentricView(gym.Wrapper):
+    """
+    Partially observable variant of a Simple-MiniGrid environment: observations are the (view_size, view_size) cell
+    types (see OBJECT_TO_IDX) in front of the agent, rotated with its direction, instead of its (x, y, dir) state
+    Goals currently in the grid (episode goal and subgoals) are seen as goal cells. reset() still returns the goal
+    """
+
+    def __init__(self, env, view_size=7):
+        super().__init__(env)
+        self.view_size = view_size
+        self.observation_space = spaces.Box(low=0, high=len(OBJECT_TO_IDX) - 1, shape=(view_size, view_size),
+                                            dtype=np.uint8)
+
+    def view(self):
+        env = self.env.unwrapped
+        padded_types = env.layout.padded_types(self.view_size - 1)
+        return egocentric_views(padded_types, env.agent_pos[None], [env.agent_dir], self.view_size,
+                                goals=env.goals[None])[0]
+
+    def reset(self, **kwargs):
+        _, goal = self.env.reset(**kwargs)
+        return self.view(), goal
+
+    def step(self, action):
+        _, reward, done, info = self.env.step(action)
+        return self.view(), reward, done, info
+
+
+class OneHotEncoder:
+    """
+    Preallocated (N, 2 * width + 2 * height + 4) float32 buffer holding one-hot encodings of agent x, agent y, agent
+    direction, goal x and goal y (in this order) for N environments
+    Only the entries set by the previous call are cleared, so encoding costs O(N) whatever the grid size
+    """
+
+    def __init__(self, width, height, num_envs=1):
+        self.sizes = np.array((width, height, 4, width, height))
+        self.offsets = np.concatenate(([0], np.cumsum(self.sizes)[:-1]))
+        self.buffer = np.zeros((num_envs, self.sizes.sum()), dtype=np.float32)
+
+        # Columns currently set to 1 in each row
+        self.rows = np.arange(num_envs)[:, None]
+        self.hot = np.zeros((num_envs, 5), dtype=np.int64)
+        self.hot_values = np.zeros((num_envs, 5), dtype=np.int64)
+
+    def encode(self, agent_pos, agent_dir, goals):
+        # Encode (N, 2) agent positions, (N,) agent directions and (N, 2) goals into self.buffer, which is returned
+        self.buffer[self.rows, self.hot] = 0
+        self.hot_values[:, :2] = agent_pos
+        self.hot_values[:, 2] = agent_dir
+        self.hot_values[:, 3:] = goals
+        np.add(self.hot_values, self.offsets, out=self.hot)
+        self.buffer[self.rows, self.hot] = 1
+        return self.buffer
+
+
+class PlaneEncoder:
+    """
+    Preallocated (N, 6, height, width) float32 buffer of spatial planes for N environments, indexed as [env, plane, y, x]
+    Planes are: walls, agent facing each of the 4 directions (a single 1 at the agent cell, in the plane of its
+    direction) and goal. The wall plane is written once, then only the agent and goal cells are updated
+    """
+
+    num_planes = 6
+
+    def __init__(self, walls, num_envs=1):
+        """
+        :param walls: (width, height) boolean wall mask in state coordinates
+        """
+
+        width, height = walls.shape
+        self.buffer = np.zeros((num_envs, self.num_planes, height, width), dtype=np.float32)
+        self.set_walls(walls)
+
+        # Cells currently set to 1 in the agent and goal planes, as (plane, y, x) for each env
+        self.env_idx = np.arange(num_envs)
+        self.agent_cells = np.zeros((num_envs, 3), dtype=np.int64)
+        self.goal_cells = np.zeros((num_envs, 3), dtype=np.int64)
+        self.goal_cells[:, 0] = self.num_planes - 1
+
+    def set_walls(self, walls):
+        # Write a (width, height) wall mask into the wall plane, e.g. when the layout changes
+        self.buffer[:, 0] = walls.T
+        return
+
+    def encode(self, agent_pos, agent_dir, goals):
+        # Encode (N, 2) agent positions, (N,) agent directions and (N, 2) goals into self.buffer, which is returned
+        for cells in (self.agent_cells, self.goal_cells):
+            self.buffer[self.env_idx, cells[:, 0], cells[:, 1], cells[:, 2]] = 0
+
+        np.add(agent_dir, 1, out=self.agent_cells[:, 0])
+        self.agent_cells[:, 1] = agent_pos[:, 1]
+        self.agent_cells[:, 2] = agent_pos[:, 0]
+        self.goal_cells[:, 1] = goals[:, 1]
+        self.goal_cells[:, 2] = goals[:, 0]
+
+        for cells in (self.agent_cells, self.goal_cells):
+            self.buffer[self.env_idx, cells[:, 0], cells[:, 1], cells[:, 2]] = 1
+        return self.buffer
+
+
+def state_walls(layout):
+    # Wall mask of a layout in state coordinates (without outer walls)
+    return layout.grid.array[1:-1, 1:-1, 0] == OBJECT_TO_IDX['wall']
+
+
+class EncodedObservation(gym.Wrapper):
+    """
+    Replace (x, y, dir) observations with one-hot vectors ('one_hot', see OneHotEncoder) or spatial planes ('planes',
+    see PlaneEncoder) of the state and goal, written into a preallocated buffer
+    The returned observation is a view of that buffer, overwritten by the next step: copy it to keep it
+    """
+
+    def __init__(self, env, encoding='one_hot'):
+        assert encoding in ('one_hot', 'planes'), f'Unknown encoding {encoding}'
+        super().__init__(env)
+        self.encoding = encoding
+        self.agent_pos = np.zeros((1, 2), dtype=np.int64)
+        self.agent_dir = np.zeros(1, dtype=np.int64)
+        self.goals = np.zeros((1, 2), dtype=np.int64)
+
+        unwrapped = env.unwrapped
+        self.layout = unwrapped.layout
+        if encoding == 'one_hot':
+            self.encoder = OneHotEncoder(unwrapped.width, unwrapped.height)
+        else:
+            self.encoder = PlaneEncoder(state_walls(self.layout))
+        self.observation_space = spaces.Box(low=0, high=1, shape=self.encoder.buffer.shape[1:], dtype=np.float32)
+
+    def observation(self):
+        env = self.env.unwrapped
+        if self.encoding == 'planes' and self.layout is not env.layout:
+            # Environments with several layouts (e.g. SimplePoolEnv)
+            self.layout = env.layout
+            self.encoder.set_walls(state_walls(self.layout))
+
+        self.agent_pos[0] = env.agent_pos
+        self.agent_dir[0] = env.agent_dir
+        self.goals[0] = env.goal_pos
+        return self.encoder.encode(self.agent_pos, self.agent_dir, self.goals)[0]
+
+    def reset(self, **kwargs):
+        _, goal = self.env.reset(**kwargs)
+        return self.observation(), goal
+
+    def step(self, action):
+        _, reward, done, info = self.env.step(action)
+        return self.observation(), reward, done, info
+
+
+class EncodedVecObservation:
+    """
+    Batched version of EncodedObservation for a SimpleMiniGridVecEnv: observations are the (N, ...) buffer of the
+    encoder, with the same layout as the single-environment observations stacked along the first axis
+    """
+
+    def __init__(self, envs, encoding='one_hot'):
+        assert encoding in ('one_hot', 'planes'), f'Unknown encoding {encoding}'
+        self.envs = envs
+        self.num_envs = envs.num_envs
+        if encoding == 'one_hot':
+            self.encoder = OneHotEncoder(envs.width, envs.height, envs.num_envs)
+        else:
+            self.encoder = PlaneEncoder(state_walls(envs.layout), envs.num_envs)
+
+    def observation(self):
+        # Encoded straight from the batched arrays of the environments, without building (N, 3) states
+        return self.encoder.encode(self.envs.agent_pos, self.envs.agent_dir, self.envs.goal_pos)
+
+    def reset(self):
+        _, goals = self.envs.reset()
+        return self.observation(), goals
+
+    def step(self, actions, env_ids=None):
+        # Observations of all environments are returned, even when only env_ids are stepped
+        _, rewards, dones, truncated = self.envs.step(actions, env_ids)
+        return self.observation(), rewards, dones, truncated
+
+    def __getattr__(self, name):
+        return getattr(self.envs, name)
@@ -0,0 +1,36 @@
+import numpy as np
+from gym_simple_minigrid.minigrid import Grid, SimpleMiniGridEnv
+
+
+class CustomEnv(SimpleMiniGridEnv):
+    # Environment without a static layout, building its grid in reset() as the original environments did
+
+    def __init__(self):
+        super().__init__(grid_size=7)
+
+    def reset(self):
+        self.step_count = 0
+        self.reset_step_info()
+        self.grid = Grid(self.width + 2, self.height + 2)
+        self.create_outer_wall()
+        self.grid.vert_wall(4, 1, 3)
+        self.goals = list()
+        self.reset_state_goal()
+        self.add_goal(self.goal_pos)
+        return self.state, self.goal_pos
+
+
+def test_custom_env_without_layout():
+    env = CustomEnv()
+    assert env.layout is None
+    for _ in range(5):
+        state, goal = env.reset()
+        assert env.num_goals == 1 and env.goal_levels[goal[0], goal[1]] == 0
+        env.add_goal((0, 0), goal_level=2)
+        env.remove_goal()
+        for action in np.random.randint(3, size=20):
+            state, reward, done, info = env.step(action)
+            assert not env.grid.walls[state[0] + 1, state[1] + 1]
+            if done:
+                break
+    assert env.render('rgb_array', tile_size=8).shape == (72, 72, 3)
@@ -0,0 +1,28 @@
+import gym
+import pytest
+import gym_simple_minigrid  # noqa: F401
+
+
+def test_distance_and_optimal_actions():
+    env = gym.make('Simple-MiniGrid-Empty-5x5-v0').unwrapped
+    assert env.distance((0, 0, 0), (2, 0)) == 2
+    assert env.distance((0, 0, 2), (2, 0)) == 4
+    assert (env.optimal_actions((0, 0, 0), (2, 0)) == [env.actions.forward]).all()
+
+
+@pytest.mark.parametrize('env_id', ['Simple-MiniGrid-Empty-100x100-v0', 'Simple-MiniGrid-FourRooms-1000x1000-v0'])
+def test_distance_too_large(env_id):
+    env = gym.make(env_id).unwrapped
+    with pytest.raises(ValueError, match='Distance tensors'):
+        env.distance((0, 0, 0), (1, 1))
+    with pytest.raises(ValueError, match='Distance tensors'):
+        env.optimal_actions((0, 0, 0), (1, 1))
+    assert env.layout._next_state is None
+
+
+@pytest.mark.parametrize('state, goal', [((0, 0, 0), (-1, 0)), ((0, 0, 0), (0, 5)), ((-1, 0, 0), (1, 1)),
+                                         ((0, 5, 0), (1, 1)), ((0, 0, 4), (1, 1))])
+def test_distance_out_of_bounds(state, goal):
+    env = gym.make('Simple-MiniGrid-Empty-5x5-v0').unwrapped
+    with pytest.raises(ValueError):
+        env.distance(state, goal)
@@ -0,0 +1,81 @@
+import gym
+import numpy as np
+import gym_simple_minigrid  # noqa: F401
+from gym_simple_minigrid.minigrid import GOAL_COLOR_IDX, OBJECT_TO_IDX
+
+
+def make_env():
+    env = gym.make('Simple-MiniGrid-Empty-15x15-v0').unwrapped
+    env.reset()
+    env.clear_goals()
+    return env
+
+
+def cell(env, x, y):
+    return tuple(env.grid.array[x + 1, y + 1])
+
+
+def test_add_goal_with_level():
+    env = make_env()
+    env.add_goal((2, 2), goal_level=3)
+    assert cell(env, 2, 2) == (OBJECT_TO_IDX['goal'], GOAL_COLOR_IDX[3])
+    assert env.goal_levels[2, 2] == 3
+    env.remove_goal()
+    assert cell(env, 2, 2) == (OBJECT_TO_IDX['empty'], 0)
+    assert env.goal_levels[2, 2] == -1
+
+
+def test_add_goals_explicit_levels_and_duplicate_cells():
+    batched, sequential = make_env(), make_env()
+    empty_grid = batched.grid.array.copy()
+    goals = [(2, 2), (3, 4), (2, 2), (5, 5), (2, 2)]
+    levels = [4, 1, 5, 0, 2]
+
+    batched.add_goals(goals, levels)
+    for goal, level in zip(goals, levels):
+        sequential.add_goal(goal, goal_level=level)
+
+    # The last goal of the batch on a cell is the visible one, as when pushing goals one by one
+    assert (batched.grid.array == sequential.grid.array).all()
+    assert (batched.goal_levels == sequential.goal_levels).all()
+    assert batched.goal_levels[2, 2] == 2
+    assert cell(batched, 2, 2) == (OBJECT_TO_IDX['goal'], GOAL_COLOR_IDX[2])
+    assert (batched.goals == np.array(goals)).all()
+
+    # Removing goals restores what each one covered
+    batched.remove_goals(2)
+    assert batched.goal_levels[2, 2] == 5
+    assert batched.goal_levels[5, 5] == -1
+    assert cell(batched, 2, 2) == (OBJECT_TO_IDX['goal'], GOAL_COLOR_IDX[5])
+
+    batched.clear_goals()
+    assert (batched.grid.array == empty_grid).all()
+    assert (batched.goal_levels == -1).all()
+    assert batched.num_goals == 0
+
+
+def test_large_layout_goals_are_sparse():
+    env = gym.make('Simple-MiniGrid-Empty-1000x1000-v0').unwrapped
+    env.reset()
+    env.clear_goals()
+    assert env.grid.array is env.layout.grid.array
+
+    env.add_goals([(2, 2), (3, 4), (2, 2)], [4, 1, 5])
+    assert env.goal_levels[2, 2] == 5
+    assert env.goal_levels[0, 0] == -1
+    cells = env.grid.cells((0, 0, 6, 6))
+    assert tuple(cells[3, 3]) == (OBJECT_TO_IDX['goal'], GOAL_COLOR_IDX[5])
+    assert tuple(cells[4, 5]) == (OBJECT_TO_IDX['goal'], GOAL_COLOR_IDX[1])
+
+    env.remove_goals(1)
+    assert env.goal_levels[2, 2] == 4
+    env.clear_goals()
+    assert not env.grid.overlay and not env.goal_levels
+
+
+def test_large_layout_dirty_cells_stay_bounded():
+    env = gym.make('Simple-MiniGrid-Empty-1000x1000-v0').unwrapped
+    for _ in range(50):
+        env.reset()
+        env.render('rgb_array', tile_size=4)
+    assert not env.dirty_cells
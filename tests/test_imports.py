@@ -0,0 +1,23 @@
+import importlib
+import pytest
+import gym_simple_minigrid
+from gym_simple_minigrid import envs
+
+
+def test_star_import_envs():
+    namespace = {}
+    exec('from gym_simple_minigrid.envs import *', namespace)
+    assert 'SimplePoolEnv' in namespace and 'SimpleFourRoomsEnv1000x1000' in namespace
+    assert set(envs.__all__) <= set(dir(envs))
+
+
+def test_missing_attribute_and_dependency(monkeypatch):
+    with pytest.raises(AttributeError):
+        gym_simple_minigrid.no_such_module
+
+    def import_module(name):
+        raise ModuleNotFoundError("No module named 'missing_dependency'", name='missing_dependency')
+
+    monkeypatch.setattr(importlib, 'import_module', import_module)
+    with pytest.raises(ModuleNotFoundError):
+        gym_simple_minigrid.optional_module
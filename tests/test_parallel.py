@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from gym_simple_minigrid.parallel import AsyncVecEnv, STEP
+
+
+def test_async_vec_env_pending_envs():
+    envs = AsyncVecEnv('Simple-MiniGrid-FourRooms-15x15-v0', num_envs=4, num_workers=2)
+    try:
+        envs.reset()
+        envs.send(np.zeros(2, dtype=int), env_ids=[0, 1])
+        with pytest.raises(ValueError):
+            envs.send(np.zeros(1, dtype=int), env_ids=[1])
+        with pytest.raises(ValueError):
+            envs.send(np.zeros(2, dtype=int), env_ids=[2, 2])
+        envs.recv(2)
+
+        # A failed step (invalid action written behind send's back) is raised once and leaves nothing pending
+        envs.actions[3] = 99
+        envs.dispatch(STEP, np.array([3]))
+        with pytest.raises(ValueError, match='Action out of bounds'):
+            envs.recv(1)
+        assert envs.num_pending == 0 and not envs.in_flight.any()
+
+        envs.send(np.zeros(4, dtype=int))
+        assert sorted(envs.recv(4)[-1]) == [0, 1, 2, 3]
+    finally:
+        envs.close()
@@ -0,0 +1,25 @@
+import gym
+import gym_simple_minigrid  # noqa: F401
+from gym_simple_minigrid import profiling
+
+
+def test_perf_stats_per_env():
+    profiling.enable()
+    try:
+        first = gym.make('Simple-MiniGrid-FourRooms-15x15-v0').unwrapped
+        second = gym.make('Simple-MiniGrid-FourRooms-15x15-v0').unwrapped
+        first.reset()
+        second.reset()
+        for _ in range(3):
+            first.step(0)
+        second.step(0)
+        second.render('rgb_array', tile_size=8)
+
+        first_stats, second_stats = first.perf_stats(), second.perf_stats()
+        assert first_stats.calls['SimpleMiniGridEnv.step'] == 3
+        assert second_stats.calls['SimpleMiniGridEnv.step'] == 1
+        # Calls made on behalf of an env are counted in its stats only
+        assert 'Grid.render' in second_stats.calls and 'Grid.render' not in first_stats.calls
+        assert profiling.perf_stats().calls['SimpleMiniGridEnv.step'] >= 4
+    finally:
+        profiling.disable()
@@ -0,0 +1,29 @@
+import gym
+import numpy as np
+import gym_simple_minigrid  # noqa: F401
+from gym_simple_minigrid.recording import TrajectoryReader, TrajectoryRecorder
+
+
+def test_episodes_reset_before_done(tmp_path):
+    path = str(tmp_path / 'recording')
+    env = TrajectoryRecorder(gym.make('Simple-MiniGrid-FourRooms-15x15-v0'), path, chunk_size=4)
+    env.reset()
+    env.step(0)
+    env.step(0)
+    env.reset()
+    for _ in range(5):
+        env.step(2)
+    env.close()
+
+    # Appending to a recording whose last episode is unfinished starts a new episode
+    env = TrajectoryRecorder(gym.make('Simple-MiniGrid-FourRooms-15x15-v0'), path, chunk_size=4)
+    env.reset()
+    for _ in range(3):
+        env.step(1)
+    env.close()
+
+    reader = TrajectoryReader(path)
+    assert (reader.episodes == np.array([[0, 2], [2, 7], [7, 10]])).all()
+    for episode in range(len(reader.episodes)):
+        start, end = reader.episodes[episode]
+        assert len(list(reader.replay(gym.make('Simple-MiniGrid-FourRooms-15x15-v0'), episode))) == end - start + 1